@@ -0,0 +1,122 @@
+from typing import List
+
+import numpy as np
+
+from vector_space import VectorSpace
+
+try:
+    import scipy.sparse
+except ImportError:
+    scipy = None
+
+
+def doc_term_matrix(vector_space: VectorSpace) -> tuple:
+    """
+    Export the normalized document vectors of an index as a CSR document-term matrix.
+    Rows follow the insertion order of the documents and columns the order of first appearance of the terms.
+    :return: Tuple of (indptr, indices, data, vocabulary term -> column, document names by row)
+    """
+    vector_space._refresh_weights()
+    vocabulary = {}
+    indptr = [0]
+    indices = []
+    data = []
+    doc_names = []
+    for doc_id, doc_name in vector_space.doc_names.items():
+        for term, weight in vector_space.doc_vectors[doc_id].items():
+            indices.append(vocabulary.setdefault(term, len(vocabulary)))
+            data.append(weight)
+        indptr.append(len(indices))
+        doc_names.append(doc_name)
+    return (np.array(indptr, dtype=np.int64), np.array(indices, dtype=np.int64), np.array(data, dtype=np.float64),
+            vocabulary, doc_names)
+
+
+class BatchScorer:
+    """
+    Scores many queries at once against a snapshot of a VectorSpace.
+    The documents are exported as a sparse document-term matrix and the queries as a sparse
+    query-term matrix weighted like `VectorSpace.rank_documents`, so all scores come from one
+    sparse matrix product followed by a top_k selection per query. Query terms are kept in
+    query order, so every document score is summed in the same order as the per-query path
+    and results are identical. Without SciPy the product is computed query by query with NumPy.
+    """
+
+    def __init__(self, vector_space: VectorSpace) -> None:
+        self.vector_space = vector_space
+        indptr, indices, data, self.vocabulary, self.doc_names = doc_term_matrix(vector_space)
+        num_docs, num_terms = len(self.doc_names), len(self.vocabulary)
+
+        # Term-major copy of the matrix: the postings of term t are in term_indptr[t]:term_indptr[t + 1]
+        doc_rows = np.repeat(np.arange(num_docs, dtype=np.int64), np.diff(indptr))
+        order = np.argsort(indices, kind="stable")
+        self.term_indptr = np.zeros(num_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(indices, minlength=num_terms), out=self.term_indptr[1:])
+        self.term_docs = doc_rows[order]
+        self.term_weights = data[order]
+
+        self.matrix = None
+        if scipy is not None:
+            self.matrix = scipy.sparse.csr_matrix((self.term_weights, self.term_docs, self.term_indptr),
+                                                  shape=(num_terms, num_docs))
+
+    def query_matrix(self, queries: List[List[str]]) -> tuple:
+        """
+        Weight tokenized queries like `VectorSpace.rank_documents` and return them as CSR arrays
+        over the vocabulary columns, keeping each query's terms in query order.
+        :return: Tuple of (indptr, indices, data)
+        """
+        indptr = [0]
+        indices = []
+        data = []
+        for query_tokens in queries:
+            for term, weight in self.vector_space._build_query_vector(query_tokens).items():
+                if term in self.vocabulary:
+                    indices.append(self.vocabulary[term])
+                    data.append(weight)
+            indptr.append(len(indices))
+        return np.array(indptr, dtype=np.int64), np.array(indices, dtype=np.int64), np.array(data, dtype=np.float64)
+
+    def _top_k(self, doc_rows: np.ndarray, scores: np.ndarray, top_k: int = None) -> List[tuple]:
+        if top_k is not None and top_k <= 0:
+            # Like heapq.nlargest in VectorSpace.rank_documents
+            return []
+        matches = scores > 0
+        doc_rows, scores = doc_rows[matches], scores[matches]
+        if top_k is not None and top_k < len(scores):
+            # Keep every document scoring at least the k-th best, so ties are broken by row below
+            threshold = np.partition(scores, len(scores) - top_k)[len(scores) - top_k]
+            keep = scores >= threshold
+            doc_rows, scores = doc_rows[keep], scores[keep]
+        order = np.lexsort((doc_rows, -scores))[:top_k]
+        return [(self.doc_names[row], score) for row, score in zip(doc_rows[order].tolist(), scores[order].tolist())]
+
+    def rank_documents_batch(self, queries: List[List[str]], top_k: int = None) -> List[List[tuple]]:
+        """
+        Rank documents for every query, like calling `VectorSpace.rank_documents(query, top_k)` on each.
+        :param queries: List of preprocessed query token lists
+        :return: One list of (document name, score) tuples per query, best first
+        """
+        indptr, indices, data = self.query_matrix(queries)
+
+        if self.matrix is not None:
+            queries_matrix = scipy.sparse.csr_matrix((data, indices, indptr),
+                                                     shape=(len(queries), len(self.vocabulary)))
+            scores = queries_matrix @ self.matrix
+            return [self._top_k(scores.indices[scores.indptr[i]:scores.indptr[i + 1]],
+                                scores.data[scores.indptr[i]:scores.indptr[i + 1]], top_k)
+                    for i in range(len(queries))]
+
+        results = []
+        for i in range(len(queries)):
+            query_terms, query_weights = indices[indptr[i]:indptr[i + 1]], data[indptr[i]:indptr[i + 1]]
+            doc_rows = [self.term_docs[self.term_indptr[term]:self.term_indptr[term + 1]] for term in query_terms]
+            weights = [self.term_weights[self.term_indptr[term]:self.term_indptr[term + 1]] * weight
+                       for term, weight in zip(query_terms, query_weights)]
+            if not doc_rows:
+                results.append([])
+                continue
+            scores = np.bincount(np.concatenate(doc_rows), weights=np.concatenate(weights),
+                                 minlength=len(self.doc_names))
+            results.append(self._top_k(np.arange(len(self.doc_names)), scores, top_k))
+        return results
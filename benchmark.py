@@ -0,0 +1,754 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import statistics
+import string
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import tldextract
+from bs4 import BeautifulSoup
+
+from batch_search import BatchScorer
+from censor import get_censor_list, get_skip_types
+from compressed_index import CompressedVectorSpace
+from crawler import WebCrawler
+from dedup import Deduplicator
+from engines import FederatedSearch, SearchEngineOpenSearch, SearchEngineYaCy, TTLCache
+from fixtures import FixtureWeb, OPEN_SEARCH_ENDPOINT, YACY_ENDPOINT
+from graph import PageRank, PersonalizedPageRank, SparsePageRank, edges_to_csr
+from html_extract import extract_page, load_lxml
+from preprocessor import Preprocessor, CachedPreprocessor
+from query_service import QueryService, save_pagerank_table
+from sharded_index import ShardedVectorSpace
+from url_filter import UrlFilter, extract_registered_domain, registered_domain
+from vector_space import VectorSpace
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+SEED = 42
+EXTRACTION_BASE_URL = "https://www.example.com/index.html"
+LINKS_REGEX = r'<a\s+(?:[^>]*?\s+)?href=["\'](https?://[^"\']+)["\']'
+
+
+def synthetic_corpus(num_docs: int = 1000, words_per_doc: int = 200, vocabulary_size: int = 5000,
+                     seed: int = SEED) -> list:
+    """
+    Generate a reproducible corpus of text documents.
+    Word frequencies follow a Zipf-like distribution and words are mixed with
+    punctuation, capitalization and contractions so every preprocessing step has work to do.
+    :return: List of document strings
+    """
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10)))
+                  for _ in range(vocabulary_size)]
+    vocabulary += ["the", "and", "of", "running", "studies", "isn't", "cannot", "won't"]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+
+    documents = []
+    for _ in range(num_docs):
+        words = rng.choices(vocabulary, weights=weights, k=words_per_doc)
+        for i in range(0, len(words), 7):
+            words[i] = words[i].capitalize() + rng.choice([",", ".", "!", "?", ";", ""])
+        documents.append(" ".join(words))
+    return documents
+
+
+def benchmark_preprocessor(num_docs: int = 1000, words_per_doc: int = 200) -> dict:
+    """Compare docs/sec of Preprocessor.preprocess and CachedPreprocessor.preprocess_many."""
+    corpus = synthetic_corpus(num_docs, words_per_doc)
+
+    start = time.perf_counter()
+    preprocessor = Preprocessor()
+    expected = [preprocessor.preprocess(document) for document in corpus]
+    baseline_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cached = list(CachedPreprocessor().preprocess_many(corpus))
+    cached_seconds = time.perf_counter() - start
+
+    if cached != expected:
+        raise AssertionError("CachedPreprocessor output differs from Preprocessor")
+
+    return {
+        "docs": num_docs,
+        "baseline_docs_per_sec": num_docs / baseline_seconds,
+        "cached_docs_per_sec": num_docs / cached_seconds,
+        "speedup": baseline_seconds / cached_seconds
+    }
+
+
+def synthetic_urls(num_urls: int = 1_000_000, num_hosts: int = 2000, seed: int = SEED) -> list:
+    """Generate reproducible URLs spread over a fixed set of hosts, a few of them censored or files."""
+    rng = random.Random(seed)
+    suffixes = ["com", "org", "net", "co.uk", "com.au", "io", "de", "edu"]
+    hosts = []
+    for _ in range(num_hosts):
+        name = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 12)))
+        subdomain = rng.choice(["", "www.", "blog.", "static.", "en."])
+        hosts.append(f"{subdomain}{name}.{rng.choice(suffixes)}")
+
+    endings = ["", "/", ".html", ".php?id=42", ".jpg", ".PDF", ".mp4", "?page=2&sort=asc"]
+    words = ["news", "article", "about", "products", "2024", "index", "search", "nude", "category"]
+    urls = []
+    for _ in range(num_urls):
+        path = "/".join(rng.choices(words[:-2] + words[-1:], k=rng.randint(1, 4)))
+        if rng.random() < 0.01:
+            path += "/" + words[-2]
+        urls.append(f"{rng.choice(['http', 'https'])}://{rng.choice(hosts)}/{path}{rng.choice(endings)}")
+    return urls
+
+
+def benchmark_url_filter(num_urls: int = 1_000_000, domain_sample: int = 100_000) -> dict:
+    """
+    Compare the per-URL cost of the original censor / skip-type checks with UrlFilter, and of
+    uncached tldextract calls with the memoized registered-domain lookup.
+    """
+    urls = synthetic_urls(num_urls)
+    censor_list = get_censor_list()
+    skip_list = get_skip_types()
+    url_filter = UrlFilter()
+
+    def baseline_is_skipped(url: str) -> bool:
+        for censored_word in censor_list:
+            if censored_word.lower() in url.lower():
+                return True
+        return any(url.lower().endswith(ext) for ext in skip_list)
+
+    start = time.perf_counter()
+    expected = [baseline_is_skipped(url) for url in urls]
+    baseline_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    filtered = [url_filter.is_skipped(url) for url in urls]
+    filter_seconds = time.perf_counter() - start
+
+    if filtered != expected:
+        raise AssertionError("UrlFilter decisions differ from the original checks")
+
+    sample = urls[:domain_sample]
+    start = time.perf_counter()
+    expected_domains = [(extracted.domain, extracted.suffix) for extracted in map(tldextract.extract, sample)]
+    baseline_domain_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    domains = [extract_registered_domain(url) for url in sample]
+    cached_domain_seconds = time.perf_counter() - start
+
+    if domains != expected_domains:
+        raise AssertionError("Cached registered domains differ from tldextract")
+
+    return {
+        "urls": num_urls,
+        "skipped": sum(filtered),
+        "baseline_filter_us_per_url": baseline_seconds / num_urls * 1e6,
+        "filter_us_per_url": filter_seconds / num_urls * 1e6,
+        "baseline_domain_us_per_url": baseline_domain_seconds / len(sample) * 1e6,
+        "cached_domain_us_per_url": cached_domain_seconds / len(sample) * 1e6
+    }
+
+
+def synthetic_html_page(rng: random.Random, text: str, links: list) -> str:
+    """Wrap text and links in a page with the usual head, script and style boilerplate."""
+    paragraphs = []
+    words = text.split()
+    for i in range(0, len(words), 40):
+        paragraphs.append(f"<p class=\"content\">{' '.join(words[i:i + 40])}</p>")
+    anchors = "\n".join(f'<li><a href="{link}" title="link">{rng.choice(words or ["link"])}</a></li>'
+                        for link in links)
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<title>{' '.join(words[:5])}</title>
+<style>body {{ font-family: sans-serif; }} .content {{ margin: 1em; }}</style>
+<script>window.analytics = {{"id": {rng.randint(1, 10 ** 6)}, "tags": ["a", "b"]}};</script>
+</head>
+<body>
+<nav><ul>
+{anchors}
+</ul></nav>
+<main>
+{chr(10).join(paragraphs)}
+</main>
+<script src="/static/app.js"></script>
+</body>
+</html>
+"""
+
+
+def synthetic_html_pages(num_pages: int = 500, words_per_page: int = 800, links_per_page: int = 40,
+                         seed: int = SEED) -> list:
+    """Generate reproducible HTML pages mixing absolute and relative links."""
+    rng = random.Random(seed)
+    corpus = synthetic_corpus(num_pages, words_per_page, seed=seed)
+    pages = []
+    for text in corpus:
+        links = []
+        for _ in range(links_per_page):
+            if rng.random() < 0.5:
+                links.append(f"https://site{rng.randint(0, 999)}.example.com/page{rng.randint(0, 99)}.html")
+            else:
+                links.append(f"/section{rng.randint(0, 9)}/page{rng.randint(0, 99)}.html")
+        pages.append(synthetic_html_page(rng, text, links))
+    return pages
+
+
+def _peak_rss() -> int:
+    """Return the peak resident set size of this process in bytes, or None where it is not available."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, KiB elsewhere
+
+
+def _baseline_extraction(html: str) -> tuple:
+    text = BeautifulSoup(html, "html.parser").get_text()
+    text = text.replace("\n", " ").replace("\t", " ").replace("\r", " ")
+    return text, re.findall(LINKS_REGEX, html)
+
+
+def _extraction_variants() -> dict:
+    variants = {"baseline": _baseline_extraction,
+                "html.parser": lambda html: extract_page(html, EXTRACTION_BASE_URL, backend="html.parser")}
+    if load_lxml() is not None:
+        variants["lxml"] = lambda html: extract_page(html, EXTRACTION_BASE_URL, backend="lxml")
+    return variants
+
+
+def _measure_extraction(name: str, pages: list) -> tuple:
+    """
+    Run one extraction variant over every page, returning (pages/sec, peak RSS in bytes).
+    Meant to run in a fresh process per variant: RSS also counts native allocations, such as
+    libxml2's under lxml, which tracemalloc does not see.
+    """
+    function = _extraction_variants()[name]
+    function(pages[0])  # import the parser before timing
+    start = time.perf_counter()
+    for page in pages:
+        function(page)
+    seconds = time.perf_counter() - start
+    return len(pages) / seconds, _peak_rss()
+
+
+def benchmark_html_extraction(pages_dir: str = None, num_pages: int = 500) -> dict:
+    """
+    Compare the original two-parse extraction (BeautifulSoup get_text plus LINKS_REGEX) with
+    the single-pass extract_page, on saved *.html pages from pages_dir or on synthetic pages.
+    Each variant runs in its own spawned process, so its peak RSS is comparable across parsers.
+    """
+    if pages_dir:
+        pages = []
+        for file_name in sorted(glob.glob(os.path.join(pages_dir, "*.html"))):
+            with open(file_name, "r", encoding="utf-8", errors="replace") as file:
+                pages.append(file.read())
+    else:
+        pages = synthetic_html_pages(num_pages)
+
+    results = {"pages": len(pages)}
+    context = multiprocessing.get_context("spawn")
+    for name in _extraction_variants():
+        with context.Pool(1) as pool:
+            pages_per_sec, peak = pool.apply(_measure_extraction, (name, pages))
+        results[name] = {"pages_per_sec": pages_per_sec, "peak_rss_bytes": peak}
+    return results
+
+
+def synthetic_token_docs(num_docs: int = 10000, words_per_doc: int = 200, seed: int = SEED) -> dict:
+    """Return {url: tokens} for a synthetic corpus, tokenized by a plain split so no NLTK data is needed."""
+    urls = synthetic_urls(num_docs, num_hosts=max(num_docs // 10, 1), seed=seed)
+    corpus = synthetic_corpus(num_docs, words_per_doc, seed=seed)
+    table = str.maketrans("", "", string.punctuation)
+    return {url: text.lower().translate(table).split() for url, text in zip(urls, corpus)}
+
+
+def synthetic_query_log(docs: dict, num_queries: int = 1000, seed: int = SEED) -> list:
+    """Sample 1-3 term queries from the documents, so frequent terms are queried more often."""
+    rng = random.Random(seed)
+    token_lists = [tokens for tokens in docs.values() if tokens]
+    return [[rng.choice(rng.choice(token_lists)) for _ in range(rng.randint(1, 3))] for _ in range(num_queries)]
+
+
+def percentiles(latencies: list) -> dict:
+    """Return the p50 / p99 / max of a list of latencies in seconds, as milliseconds."""
+    cut_points = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {"p50_ms": cut_points[49] * 1000, "p99_ms": cut_points[98] * 1000, "max_ms": max(latencies) * 1000}
+
+
+def benchmark_query_service(num_docs: int = 10000, num_queries: int = 1000, top_k: int = 10) -> dict:
+    """Measure QueryService latency percentiles over a synthetic query log."""
+    docs = synthetic_token_docs(num_docs)
+    rng = random.Random(SEED)
+    pagerank = {registered_domain(url): rng.random() for url in docs}
+
+    with tempfile.TemporaryDirectory() as directory:
+        index_path = os.path.join(directory, "index.bin")
+        pagerank_path = os.path.join(directory, "pagerank.json")
+        vector_space = VectorSpace()
+        vector_space.set_docs(docs)
+        vector_space.save(index_path)
+        save_pagerank_table(pagerank, pagerank_path)
+
+        service = QueryService(index_path, pagerank_path)
+        latencies = []
+        for query_tokens in synthetic_query_log(docs, num_queries):
+            start = time.perf_counter()
+            service.search_tokens(query_tokens, top_k)
+            latencies.append(time.perf_counter() - start)
+        service.close()
+
+    return {"docs": num_docs, "queries": num_queries, **percentiles(latencies)}
+
+
+def benchmark_posting_compression(num_docs: int = 10000, num_queries: int = 1000, top_k: int = 10) -> dict:
+    """
+    Compare the memory per posting of the dict-of-dicts inverted index with CompressedVectorSpace,
+    and the ranking quality of the quantized weights against the float index.
+    """
+    docs = synthetic_token_docs(num_docs)
+    vector_space = VectorSpace()
+    vector_space.set_docs(docs)
+    num_postings = sum(len(postings) for postings in vector_space.inverted_index.values())
+
+    # Copy the index with fresh float objects, as the originals are shared with doc_vectors
+    tracemalloc.start()
+    inverted_index = {term: {doc_id: weight * 1.0 for doc_id, weight in postings.items()}
+                      for term, postings in vector_space.inverted_index.items()}
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del inverted_index
+
+    queries = synthetic_query_log(docs, num_queries)
+    expected = [vector_space.rank_documents(query_tokens) for query_tokens in queries]
+
+    results = {"docs": num_docs, "postings": num_postings, "dict_bytes_per_posting": dict_bytes / num_postings}
+    for weight_bits in (8, 16):
+        tracemalloc.start()
+        compressed = CompressedVectorSpace(vector_space, weight_bits)
+        compressed_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        max_error = 0.0
+        overlap = 0
+        for query_tokens, ranked in zip(queries, expected):
+            approximate = compressed.rank_documents(query_tokens)
+            exact_scores = dict(ranked)
+            for doc_name, score in approximate:
+                max_error = max(max_error, abs(score - exact_scores.get(doc_name, 0.0)))
+            overlap += len({doc_name for doc_name, _ in ranked[:top_k]} &
+                           {doc_name for doc_name, _ in approximate[:top_k]})
+        expected_results = sum(min(len(ranked), top_k) for ranked in expected)
+
+        results[f"{weight_bits}_bit"] = {
+            "bytes_per_posting": compressed_bytes / num_postings,
+            "postings_bytes_per_posting": compressed.postings_nbytes() / num_postings,
+            "max_score_error": max_error,
+            "top_k_overlap": overlap / expected_results if expected_results else 1.0
+        }
+    return results
+
+
+def synthetic_near_duplicates(num_docs: int = 5000, duplicate_rate: float = 0.2, edit_rate: float = 0.01,
+                              seed: int = SEED) -> tuple:
+    """
+    Generate a corpus where a fraction of the documents are mirrors of earlier ones, with a few
+    words replaced and a different footer, as on syndicated or boilerplate-heavy pages.
+    :return: Tuple of ({url: text}, {duplicate url: original url})
+    """
+    rng = random.Random(seed)
+    num_originals = int(num_docs * (1 - duplicate_rate))
+    corpus = synthetic_corpus(num_originals, seed=seed)
+    urls = synthetic_urls(num_docs, num_hosts=max(num_docs // 10, 1), seed=seed)
+
+    documents = dict(zip(urls, corpus))
+    originals = list(documents)
+    duplicates = {}
+    for url in urls[num_originals:]:
+        original = rng.choice(originals)
+        words = documents[original].split()
+        for _ in range(int(len(words) * edit_rate)):
+            words[rng.randrange(len(words))] = rng.choice(words)
+        footer = f"Mirrored by {url} all rights reserved"
+        documents[url] = " ".join(words) + " " + footer
+        duplicates[url] = original
+    return documents, duplicates
+
+
+def benchmark_dedup(num_docs: int = 5000, threshold: float = 0.8) -> dict:
+    """
+    Measure docs/sec of the Deduplicator on a corpus with injected near-duplicates, how many of them
+    it finds, and the documents and postings it removes from a VectorSpace index.
+    """
+    documents, duplicates = synthetic_near_duplicates(num_docs)
+    deduplicator = Deduplicator(threshold)
+
+    start = time.perf_counter()
+    unique = deduplicator.deduplicate(documents)
+    seconds = time.perf_counter() - start
+
+    found = {url for aliases in deduplicator.aliases.values() for url in aliases}
+    true_positives = len(found & set(duplicates))
+
+    def count_postings(docs: dict) -> int:
+        vector_space = VectorSpace()
+        vector_space.set_docs({url: text.lower().split() for url, text in docs.items()})
+        return sum(len(postings) for postings in vector_space.inverted_index.values())
+
+    postings = count_postings(documents)
+    return {
+        "docs": num_docs,
+        "docs_per_sec": num_docs / seconds,
+        "bands": deduplicator.bands,
+        "rows": deduplicator.rows,
+        "docs_removed": num_docs - len(unique),
+        "postings_removed": postings - count_postings(unique),
+        "postings": postings,
+        "precision": true_positives / len(found) if found else 1.0,
+        "recall": true_positives / len(duplicates) if duplicates else 1.0
+    }
+
+
+def benchmark_sharded_search(num_docs: int = 20000, num_queries: int = 500, top_k: int = 10,
+                             shard_counts: tuple = (1, 2, 4, 8)) -> dict:
+    """
+    Compare queries/sec of a single VectorSpace with ShardedVectorSpace at several shard counts,
+    checking that every sharded result list is identical. Speedups need at least as many cores as shards.
+    """
+    docs = synthetic_token_docs(num_docs)
+    queries = synthetic_query_log(docs, num_queries)
+
+    vector_space = VectorSpace()
+    vector_space.set_docs(docs)
+    start = time.perf_counter()
+    expected = [vector_space.rank_documents(query_tokens, top_k) for query_tokens in queries]
+    results = {"docs": num_docs, "queries": num_queries, "cores": os.cpu_count(),
+               "unsharded_queries_per_sec": num_queries / (time.perf_counter() - start)}
+
+    for num_shards in shard_counts:
+        with ShardedVectorSpace(num_shards) as sharded:
+            start = time.perf_counter()
+            sharded.set_docs(docs)
+            build_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            ranked = [sharded.rank_documents(query_tokens, top_k) for query_tokens in queries]
+            seconds = time.perf_counter() - start
+
+        if ranked != expected:
+            raise AssertionError(f"ShardedVectorSpace with {num_shards} shards ranks differently")
+        results[f"{num_shards}_shards"] = {"build_seconds": build_seconds, "queries_per_sec": num_queries / seconds}
+    return results
+
+
+def benchmark_batch_search(num_docs: int = 10000, num_queries: int = 2000, top_k: int = 10) -> dict:
+    """Compare queries/sec of per-query VectorSpace.rank_documents with BatchScorer.rank_documents_batch."""
+    docs = synthetic_token_docs(num_docs)
+    queries = synthetic_query_log(docs, num_queries)
+    vector_space = VectorSpace()
+    vector_space.set_docs(docs)
+
+    start = time.perf_counter()
+    expected = [vector_space.rank_documents(query_tokens, top_k) for query_tokens in queries]
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scorer = BatchScorer(vector_space)
+    export_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ranked = scorer.rank_documents_batch(queries, top_k)
+    batch_seconds = time.perf_counter() - start
+
+    if ranked != expected:
+        raise AssertionError("BatchScorer results differ from VectorSpace.rank_documents")
+
+    return {
+        "docs": num_docs,
+        "queries": num_queries,
+        "sparse_product": scorer.matrix is not None,
+        "export_seconds": export_seconds,
+        "loop_queries_per_sec": num_queries / loop_seconds,
+        "batch_queries_per_sec": num_queries / batch_seconds
+    }
+
+
+STARTUP_MODULES = ("vector_space", "preprocessor", "query_service", "indexer", "engines", "crawler", "graph")
+# Maximum cold import time in milliseconds of each entry module, a few times the time measured
+# with heavy dependencies loaded on first use, so that an eager import fails the benchmark
+STARTUP_BUDGET_MS = {
+    "vector_space": 50,
+    "preprocessor": 50,
+    "query_service": 60,
+    "indexer": 150,
+    "engines": 300,
+    "crawler": 300,
+    "graph": 250
+}
+
+
+def benchmark_startup(modules: tuple = STARTUP_MODULES, repeat: int = 3, budget_ms: dict = STARTUP_BUDGET_MS) -> dict:
+    """
+    Measure the cold import time of each entry module with `python -X importtime`, in a fresh
+    interpreter per run, keeping the best of `repeat` runs.
+    :param budget_ms: Module -> maximum import time in milliseconds, STARTUP_BUDGET_MS by default
+        and None to disable; an AssertionError lists every module over its budget, so a regression fails loudly
+    :return: Module -> {"import_ms": cumulative import time, "modules": number of modules imported}
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for module in modules:
+        best = None
+        for _ in range(repeat):
+            completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                       cwd=directory, capture_output=True, text=True, check=True)
+            # Lines look like "import time: <self us> | <cumulative us> | <indented module name>"
+            lines = [line.split("|") for line in completed.stderr.splitlines() if line.startswith("import time:")]
+            lines = [fields for fields in lines if len(fields) == 3 and fields[1].strip().isdigit()]
+            total_us = next(int(fields[1]) for fields in lines if fields[2].strip() == module
+                            and not fields[2].startswith("  "))
+            if best is None or total_us < best["import_ms"] * 1000:
+                best = {"import_ms": total_us / 1000, "modules": len(lines)}
+        results[module] = best
+
+    over_budget = {module: results[module]["import_ms"] for module, limit in (budget_ms or {}).items()
+                   if module in results and results[module]["import_ms"] > limit}
+    if over_budget:
+        raise AssertionError(f"Import time over budget: {over_budget}")
+    return results
+
+
+def benchmark_crawl(num_hosts: int = 10, pages_per_host: int = 50, links_per_page: int = 10, depth: int = 3,
+                    workers: int = 8) -> dict:
+    """Measure crawl pages/sec against a FixtureWeb served from local HTTP servers, without politeness delays."""
+    with FixtureWeb(num_hosts, pages_per_host, links_per_page) as web:
+        crawler = WebCrawler(depth=depth, workers=workers, per_host_limit=workers, host_delay=0)
+        start = time.perf_counter()
+        link_map = crawler.crawl(web.seed_urls)
+        seconds = time.perf_counter() - start
+
+    return {"hosts": num_hosts, "pages_per_host": pages_per_host, "depth": depth, "workers": workers,
+            "pages": len(link_map), "requests": crawler.stats["requests"], "seconds": seconds,
+            "pages_per_sec": len(link_map) / seconds}
+
+
+def benchmark_vector_space(num_docs: int = 10000, num_queries: int = 1000, top_k: int = 10) -> dict:
+    """Measure VectorSpace build time and rank_documents latency percentiles over a synthetic query log."""
+    docs = synthetic_token_docs(num_docs)
+    queries = synthetic_query_log(docs, num_queries)
+
+    vector_space = VectorSpace()
+    start = time.perf_counter()
+    vector_space.set_docs(docs)
+    build_seconds = time.perf_counter() - start
+
+    latencies = []
+    for query_tokens in queries:
+        start = time.perf_counter()
+        vector_space.rank_documents(query_tokens, top_k)
+        latencies.append(time.perf_counter() - start)
+
+    return {"docs": num_docs, "queries": num_queries, "build_seconds": build_seconds,
+            "docs_per_sec": num_docs / build_seconds, **percentiles(latencies)}
+
+
+def synthetic_csr_graph(num_nodes: int, average_degree: int = 8, seed: int = SEED) -> tuple:
+    """Generate reproducible CSR adjacency arrays whose link targets favour low node ids."""
+    rng = np.random.default_rng(seed)
+    sources = rng.integers(0, num_nodes, size=num_nodes * average_degree)
+    targets = np.minimum((rng.pareto(1.0, size=len(sources)) * num_nodes / 100).astype(np.int64), num_nodes - 1)
+    return edges_to_csr(sources, targets, num_nodes)
+
+
+def benchmark_pagerank(node_counts: tuple = (1000, 10000, 100000), average_degree: int = 8,
+                       dense_limit: int = 2000) -> dict:
+    """
+    Measure PageRank time and peak traced memory against the number of nodes, for the sparse
+    engines and, up to dense_limit nodes, the dense N x N one.
+    """
+    results = {}
+    for num_nodes in node_counts:
+        indptr, indices = synthetic_csr_graph(num_nodes, average_degree)
+        labels = list(range(num_nodes))
+        engines = {"sparse": lambda: SparsePageRank(indptr, indices, labels),
+                   "personalized": lambda: PersonalizedPageRank(indptr, indices, labels)}
+        if num_nodes <= dense_limit:
+            def dense():
+                matrix = np.zeros((num_nodes, num_nodes))
+                matrix[indices, np.repeat(np.arange(num_nodes), np.diff(indptr))] = 1
+                return PageRank(matrix, labels)
+            engines["dense"] = dense
+
+        results[num_nodes] = {}
+        for name, engine in engines.items():
+            tracemalloc.start()
+            start = time.perf_counter()
+            pagerank = engine()
+            pagerank.calculate_pagerank()
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results[num_nodes][name] = {"seconds": seconds, "peak_memory_bytes": peak,
+                                        "iterations": getattr(pagerank, "iterations", None)}
+    return results
+
+
+def benchmark_engines(num_queries: int = 5, opensearch_limit: int = 30) -> dict:
+    """Measure FederatedSearch latency against the local YaCy and OpenSearch stubs, cold and cached."""
+    with FixtureWeb(num_hosts=2, pages_per_host=20) as web:
+        search = FederatedSearch(SearchEngineYaCy(web.search_base_url, YACY_ENDPOINT),
+                                 SearchEngineOpenSearch(opensearch_limit, web.search_base_url, OPEN_SEARCH_ENDPOINT,
+                                                        api_key="benchmark", cx="benchmark"),
+                                 cache=TTLCache())
+        cold, cached, links = [], [], 0
+        for i in range(num_queries):
+            query = f"benchmark query {i}"
+            start = time.perf_counter()
+            links += len(search.search(query)["links"])
+            cold.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            search.search(query.upper())
+            cached.append(time.perf_counter() - start)
+        search.close()
+
+    return {"queries": num_queries, "links_per_query": links / num_queries,
+            "cold_ms": statistics.mean(cold) * 1000, "cached_ms": statistics.mean(cached) * 1000}
+
+
+SUITE_SCALES = {
+    "small": {
+        "preprocessor": {"num_docs": 200},
+        "crawl": {"num_hosts": 5, "pages_per_host": 20},
+        "vector_space": {"num_docs": 2000, "num_queries": 200},
+        "pagerank": {"node_counts": (1000, 10000)},
+        "engines": {"num_queries": 3},
+        "startup": {"repeat": 1}
+    },
+    "full": {
+        "preprocessor": {},
+        "crawl": {},
+        "vector_space": {},
+        "pagerank": {"node_counts": (1000, 10000, 100000, 1000000)},
+        "engines": {},
+        "startup": {}
+    }
+}
+
+SUITE_BENCHMARKS = {
+    "preprocessor": benchmark_preprocessor,
+    "crawl": benchmark_crawl,
+    "vector_space": benchmark_vector_space,
+    "pagerank": benchmark_pagerank,
+    "engines": benchmark_engines,
+    "startup": benchmark_startup
+}
+
+
+def _git_commit() -> str:
+    try:
+        completed = subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                   capture_output=True, text=True, check=True)
+        return completed.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark_suite(output_path: str = None, scale: str = "small", benchmarks: list = None) -> dict:
+    """
+    Run the reproducible benchmark suite and optionally write the results as JSON, together with
+    the commit, interpreter and machine they were measured on, so runs can be compared across commits.
+    A benchmark that fails, e.g. because NLTK data is missing, records its error instead of its results.
+    :param scale: A key of SUITE_SCALES
+    :param benchmarks: Names of SUITE_BENCHMARKS to run, all by default
+    """
+    results = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "scale": scale,
+        "benchmarks": {}
+    }
+    for name in benchmarks or SUITE_BENCHMARKS:
+        parameters = SUITE_SCALES[scale][name]
+        try:
+            result = SUITE_BENCHMARKS[name](**parameters)
+        except Exception as e:
+            result = {"error": f"{type(e).__name__}: {e}"}
+        results["benchmarks"][name] = {"parameters": parameters, "results": result}
+
+    if output_path:
+        with open(output_path, "w") as file:
+            json.dump(results, file, indent=2, default=str)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the benchmarks")
+    parser.add_argument("--output", help="Run the benchmark suite and write its results to this JSON file")
+    parser.add_argument("--scale", choices=sorted(SUITE_SCALES), default="small", help="Size of the benchmark suite")
+    args = parser.parse_args()
+    if args.output:
+        run_benchmark_suite(args.output, args.scale)
+        print(f"Wrote benchmark results to {args.output}")
+        sys.exit()
+
+    results = benchmark_preprocessor()
+    print(f"Preprocessor: {results['baseline_docs_per_sec']:.1f} docs/sec")
+    print(f"CachedPreprocessor: {results['cached_docs_per_sec']:.1f} docs/sec ({results['speedup']:.1f}x)")
+
+    results = benchmark_url_filter()
+    print(f"URL filter: {results['baseline_filter_us_per_url']:.2f} us/url -> {results['filter_us_per_url']:.2f} us/url")
+    print(f"Registered domain: {results['baseline_domain_us_per_url']:.2f} us/url -> "
+          f"{results['cached_domain_us_per_url']:.2f} us/url")
+
+    results = benchmark_html_extraction()
+    for name in ("baseline", "html.parser", "lxml"):
+        if name in results:
+            peak = results[name]["peak_rss_bytes"]
+            print(f"HTML extraction ({name}): {results[name]['pages_per_sec']:.1f} pages/sec"
+                  + (f", peak RSS {peak / 2 ** 20:.1f} MiB" if peak is not None else ""))
+
+    results = benchmark_query_service()
+    print(f"QueryService over {results['docs']} docs: p50 {results['p50_ms']:.2f} ms, p99 {results['p99_ms']:.2f} ms")
+
+    results = benchmark_posting_compression()
+    print(f"Inverted index: {results['dict_bytes_per_posting']:.1f} bytes/posting")
+    for weight_bits in (8, 16):
+        compressed = results[f"{weight_bits}_bit"]
+        print(f"Compressed postings ({weight_bits}-bit weights): {compressed['bytes_per_posting']:.1f} bytes/posting, "
+              f"max score error {compressed['max_score_error']:.5f}, top-10 overlap {compressed['top_k_overlap']:.1%}")
+
+    results = benchmark_dedup()
+    print(f"Dedup: {results['docs_per_sec']:.1f} docs/sec, removed {results['docs_removed']} of {results['docs']} docs "
+          f"and {results['postings_removed']} of {results['postings']} postings, "
+          f"precision {results['precision']:.1%}, recall {results['recall']:.1%}")
+
+    results = benchmark_sharded_search()
+    print(f"Unsharded VectorSpace: {results['unsharded_queries_per_sec']:.1f} queries/sec")
+    for num_shards in (1, 2, 4, 8):
+        sharded = results[f"{num_shards}_shards"]
+        print(f"ShardedVectorSpace ({num_shards} shards, {results['cores']} cores): "
+              f"{sharded['queries_per_sec']:.1f} queries/sec, built in {sharded['build_seconds']:.1f}s")
+
+    results = benchmark_batch_search()
+    print(f"Batch scoring: {results['loop_queries_per_sec']:.1f} queries/sec per query -> "
+          f"{results['batch_queries_per_sec']:.1f} queries/sec batched "
+          f"({'SciPy' if results['sparse_product'] else 'NumPy'}, matrix exported in {results['export_seconds']:.2f}s)")
+
+    results = benchmark_startup()
+    for module, startup in results.items():
+        print(f"import {module}: {startup['import_ms']:.1f} ms, {startup['modules']} modules")
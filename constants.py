@@ -1,2 +1,8 @@
 EMPTY = ""
 SPACE = " "
+
+# Status of a crawl record
+STATUS_OK = "ok"
+STATUS_TIMEOUT = "timeout"
+STATUS_ERROR = "error"
+STATUS_DISALLOWED = "disallowed"
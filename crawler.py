@@ -1,14 +1,36 @@
 import requests
-import re
-from urllib.parse import urljoin, urlparse
-from censor import get_censor_list, get_skip_types
-from bs4 import BeautifulSoup
+import glob
+import heapq
+import json
+import logging
+import os
+import sys
+from array import array
+from hashlib import blake2b
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+from url_filter import UrlFilter
+from constants import STATUS_OK, STATUS_TIMEOUT, STATUS_ERROR, STATUS_DISALLOWED
+from robots import RobotsCache, USER_AGENT, ROBOTS_TTL
+from html_extract import extract_page
+from metrics import METRICS
 
-LINKS_REGEX = r'<a\s+(?:[^>]*?\s+)?href=["\'](https?://[^"\']+)["\']'
 TIMEOUT = 10  # seconds
+PER_HOST_LIMIT = 2  # concurrent requests per host
+HOST_DELAY = 1.0  # seconds between requests to the same host
+POOL_CONNECTIONS = 10  # number of hosts to keep connection pools for
+POOL_MAXSIZE = 10  # keep-alive connections per host pool
+CHECKPOINT_EVERY = 100  # pages crawled between checkpoints
+CHECKPOINT_VERSION = 3
 
-CENSOR_LIST = get_censor_list()
-SKIP_LIST = get_skip_types()
+URL_FILTER = UrlFilter()
+
+logger = logging.getLogger(__name__)
 
 
 class Crawler:
@@ -25,63 +47,340 @@ class Crawler:
         pass
 
 
-class WebCrawler(Crawler):
-    def __init__(self, depth: int = 1) -> None:
-        super().__init__()
-        self.depth = depth
-        self.visited = set()
-        self.link_map = {}
-        self.robots_cache = {}
+class HostThrottle:
+    """Enforces a minimum delay between consecutive requests to the same host."""
 
-    def extract_links(self, html: str, base_url: str) -> list:
-        links = []
-        for link in re.findall(LINKS_REGEX, html):
-            absolute_link = urljoin(base_url, link)
-            links.append(absolute_link)
-        return links
+    def __init__(self, min_delay: float = HOST_DELAY) -> None:
+        self.min_delay = min_delay
+        self._next_allowed = {}
+        self._lock = threading.Lock()
 
-    def normalize_html(self, html: str) -> str:
+    def wait(self, host: str, min_delay: float = None) -> None:
+        """
+        Block until a request to the host is allowed and reserve the next slot.
+        :param host: Host the request goes to
+        :param min_delay: Delay required by the host itself, e.g. its robots.txt Crawl-delay
+        """
+        delay = self.min_delay if min_delay is None else max(self.min_delay, min_delay)
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_allowed.get(host, now))
+            self._next_allowed[host] = start + delay
+        if start > now:
+            time.sleep(start - now)
+
+
+class HostFrontier:
+    """
+    Crawl frontier with one FIFO queue per host, scheduled by the crawler's dispatcher thread.
+    A host is ready when it has queued URLs, fewer than `per_host_limit` requests in flight and
+    its next allowed request time has passed. `pop` returns the oldest URL of any ready host,
+    so politeness delays never hold a worker and hosts that are not ready cost nothing.
+    """
+
+    def __init__(self, entries=(), per_host_limit: int = PER_HOST_LIMIT) -> None:
+        self.per_host_limit = per_host_limit
+        self.queues = {}  # host -> deque of (sequence, url, depth)
+        self.load = {}  # host -> requests in flight
+        self.next_allowed = {}  # host -> monotonic time of its next request, None until its delay is known
+        self._ready = []  # heap of (sequence of the host's oldest URL, host)
+        self._waiting = []  # heap of (next allowed time, host)
+        self._scheduled = set()  # hosts in one of the heaps
+        self._sequence = 0
+        self._size = 0
+        for entry in entries:
+            self.append(entry)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self):
+        """Iterate over the queued (url, depth) pairs in the order they were added."""
+        for _, url, depth in heapq.merge(*self.queues.values()):
+            yield url, depth
+
+    def append(self, entry: tuple) -> None:
+        url, depth = entry
+        host = urlparse(url).netloc
+        queue = self.queues.setdefault(host, deque())
+        queue.append((self._sequence, url, depth))
+        self._sequence += 1
+        self._size += 1
+        if len(queue) == 1:
+            self._schedule(host, time.monotonic())
+
+    def _schedule(self, host: str, now: float) -> None:
+        """Put a host in the ready or the waiting heap if it has queued URLs and a free slot."""
+        if host in self._scheduled or host not in self.queues or self.load.get(host, 0) >= self.per_host_limit:
+            return
+        next_allowed = self.next_allowed.get(host, now)
+        if next_allowed is None:
+            return
+        self._scheduled.add(host)
+        if next_allowed > now:
+            heapq.heappush(self._waiting, (next_allowed, host))
+        else:
+            heapq.heappush(self._ready, (self.queues[host][0][0], host))
 
-        html = BeautifulSoup(html, "html.parser").get_text()
-        html = html.replace("\n", " ")
-        html = html.replace("\t", " ")
-        html = html.replace("\r", " ")
+    def pop(self, now: float) -> tuple:
+        """
+        Remove the oldest URL of any ready host. The caller must then `start` or `skip` the host.
+        :return: Tuple of (url, depth, host), or None if no host is ready
+        """
+        while self._waiting and self._waiting[0][0] <= now:
+            _, host = heapq.heappop(self._waiting)
+            self._scheduled.discard(host)
+            self._schedule(host, now)
+        if not self._ready:
+            return None
+        _, host = heapq.heappop(self._ready)
+        self._scheduled.discard(host)
+        queue = self.queues[host]
+        _, url, depth = queue.popleft()
+        if not queue:
+            del self.queues[host]
+        self._size -= 1
+        return url, depth, host
+
+    def start(self, host: str, now: float, delay: float = None) -> None:
+        """
+        Record a request to a host and reserve its next slot.
+        :param delay: Seconds until the next request to the host, or None to hold the host until `finish`
+        """
+        self.load[host] = self.load.get(host, 0) + 1
+        self.next_allowed[host] = None if delay is None else now + delay
+        self._schedule(host, now)
+
+    def skip(self, host: str, now: float) -> None:
+        """Reschedule a host whose popped URL was not requested."""
+        self._schedule(host, now)
+
+    def finish(self, host: str, started: float, delay: float, now: float) -> None:
+        """Record a completed request to a host, started at `started`, setting its delay if it was held."""
+        self.load[host] -= 1
+        if not self.load[host]:
+            del self.load[host]
+        if host in self.next_allowed and self.next_allowed[host] is None:
+            self.next_allowed[host] = started + delay
+        self._schedule(host, now)
+
+    def next_wakeup(self, now: float) -> float:
+        """Seconds until the next waiting host becomes ready, or None if no host is waiting."""
+        return max(self._waiting[0][0] - now, 0.0) if self._waiting else None
+
+
+class ReuseCountingAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that counts the requests sent over an already open keep-alive connection.
+    Reuse is checked per request, because urllib3 reconnects a dropped connection in place
+    and discards the pools of evicted hosts, so pool connection counts undercount new connections.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        self.connections_reused = 0
+        self._lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": self._counting_pool(HTTPConnectionPool),
+                                                   "https": self._counting_pool(HTTPSConnectionPool)}
+
+    def _counting_pool(self, pool_class: type) -> type:
+        adapter = self
+
+        class ReuseCountingPool(pool_class):
+            def _make_request(self, conn, *args, **kwargs):
+                # A dropped connection was closed by _get_conn, so only a live socket is reused
+                if conn.sock is not None:
+                    with adapter._lock:
+                        adapter.connections_reused += 1
+                return super()._make_request(conn, *args, **kwargs)
+
+        return ReuseCountingPool
+
+
+class ValidatorCache:
+    """
+    On-disk cache of HTTP validators (ETag / Last-Modified) together with the
+    extracted page content, so unchanged pages can be re-fetched conditionally.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r") as file:
+                self.entries = json.load(file)
+
+    def get(self, url: str) -> dict:
+        with self._lock:
+            return self.entries.get(url)
+
+    def headers(self, entry: dict) -> dict:
+        """Return the conditional request headers for a cached entry."""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url: str, response: requests.Response, document: str, links: list) -> None:
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        with self._lock:
+            self.entries[url] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "size": len(response.content),
+                "document": document,
+                "links": links
+            }
 
-        return html
+    def save(self) -> None:
+        """Atomically write the cache, so an interrupted save keeps the previous file."""
+        with self._lock:
+            temporary_path = self.path + ".tmp"
+            with open(temporary_path, "w") as file:
+                json.dump(self.entries, file)
+            os.replace(temporary_path, self.path)
+
+
+class VisitedSet:
+    """
+    Set of URLs stored as 64-bit fingerprints instead of full URL strings.
+    After `start_journal`, fingerprints added to the set are also collected in `journal`,
+    so checkpoints can append them to a log instead of rewriting the whole set.
+    """
+
+    def __init__(self, fingerprints=None) -> None:
+        self.fingerprints = set(fingerprints or [])
+        self.journal = None
+
+    @staticmethod
+    def fingerprint(url: str) -> int:
+        return int.from_bytes(blake2b(url.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def add(self, url: str) -> None:
+        fingerprint = self.fingerprint(url)
+        if self.journal is not None and fingerprint not in self.fingerprints:
+            self.journal.append(fingerprint)
+        self.fingerprints.add(fingerprint)
+
+    def update(self, urls) -> None:
+        for url in urls:
+            self.add(url)
 
-    def __is_censored(self, url: str) -> bool:
-        for censored_word in CENSOR_LIST:
-            if censored_word.lower() in url.lower():
-                return True
-        return False
+    def __contains__(self, url: str) -> bool:
+        return self.fingerprint(url) in self.fingerprints
 
-    def __is_skip_type(self, url: str) -> bool:
-        """Check if the URL ends with a file type that should be skipped."""
-        return any(url.lower().endswith(ext) for ext in SKIP_LIST)
+    def __len__(self) -> int:
+        return len(self.fingerprints)
 
-    def __fetch_robots_txt(self, domain: str) -> set:
-        """
-        Fetch and parse robots.txt rules for the given domain.
-        :param domain: The domain to fetch robots.txt for
-        :return: A set of disallowed paths
-        """
-        robots_url = f"http://{domain}/robots.txt"
-        disallowed_paths = set()
+    def start_journal(self) -> None:
+        self.journal = []
 
-        try:
-            response = requests.get(robots_url, timeout=TIMEOUT)
-            if response.status_code == 200:
-                for line in response.text.splitlines():
-                    if line.strip().lower().startswith("disallow:"):
-                        path = line.split(":", 1)[1].strip()
-                        if path:
-                            disallowed_paths.add(path)
-            else:
-                print(f"No robots.txt found for domain: {domain}")
-        except requests.RequestException as e:
-            print(f"Error fetching robots.txt for {domain}: {e}")
+    def take_journal(self) -> list:
+        """Return the fingerprints added since the journal was started or last taken."""
+        journal, self.journal = self.journal, []
+        return journal
+
+
+def write_fingerprints(path: str, fingerprints, mode: str = "wb") -> None:
+    """Write fingerprints to a binary log as big-endian 64-bit integers, appending with mode "ab"."""
+    data = array("Q", fingerprints)
+    if sys.byteorder == "little":
+        data.byteswap()
+    with open(path, mode) as file:
+        file.write(data.tobytes())
+
+
+def read_fingerprints(path: str, count: int) -> array:
+    """Read the first count fingerprints of a binary log written by `write_fingerprints`."""
+    data = array("Q")
+    with open(path, "rb") as file:
+        data.frombytes(file.read(count * data.itemsize))
+    if len(data) != count:
+        raise ValueError(f"{path} holds {len(data)} fingerprints, expected {count}")
+    if sys.byteorder == "little":
+        data.byteswap()
+    return data
+
+
+class RecordSink:
+    """Appends crawl records to a newline-delimited JSON file as they are produced."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
 
-        return disallowed_paths
+
+class WebCrawler(Crawler):
+    def __init__(self, depth: int = 1, workers: int = 1, per_host_limit: int = PER_HOST_LIMIT,
+                 host_delay: float = HOST_DELAY, pool_connections: int = POOL_CONNECTIONS,
+                 pool_maxsize: int = POOL_MAXSIZE, cache_path: str = None, sink_path: str = None,
+                 keep_link_map: bool = True, checkpoint_path: str = None,
+                 checkpoint_every: int = CHECKPOINT_EVERY, checkpoint_interval: float = None, obey_robots: bool = True,
+                 user_agent: str = USER_AGENT, robots_ttl: float = ROBOTS_TTL, html_backend: str = None) -> None:
+        super().__init__()
+        self.depth = depth
+        self.html_backend = html_backend
+        self.workers = workers
+        self.per_host_limit = per_host_limit
+        self.throttle = HostThrottle(host_delay)
+        self.visited = VisitedSet()
+        self.link_map = {}
+
+        # Shared keep-alive session, sized so every worker can hold a pooled connection
+        self.session = requests.Session()
+        self.adapter = ReuseCountingAdapter(pool_connections=pool_connections, pool_maxsize=max(pool_maxsize, workers))
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.session.headers["User-Agent"] = user_agent
+
+        self.obey_robots = obey_robots
+        self.robots = RobotsCache(self.session, user_agent, robots_ttl)
+
+        self.validator_cache = ValidatorCache(cache_path) if cache_path else None
+        self.sink_path = sink_path
+        self.sink = None
+        self.keep_link_map = keep_link_map
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+        self._checkpoint_logs = None  # [checkpoint path, log prefix, visited count, scheduled count]
+        self.stats = {}
+        self._stats_lock = threading.Lock()
+
+    def extract_links(self, html: str, base_url: str) -> list:
+        return extract_page(html, base_url, need_text=False, backend=self.html_backend)[1]
+
+    def normalize_html(self, html: str) -> str:
+        return extract_page(html, "", backend=self.html_backend)[0]
+
+    def __is_skipped(self, url: str) -> bool:
+        """Check in one pass if the URL is censored or ends with a file type that should be skipped."""
+        if not URL_FILTER.is_skipped(url):
+            return False
+        if logger.isEnabledFor(logging.DEBUG):
+            reason = "censored link" if URL_FILTER.is_censored(url) else "file link (skip type)"
+            logger.debug("Skipping %s: %s", reason, url)
+        METRICS.count("crawler.skipped")
+        return True
 
     def __is_allowed_by_robots(self, url: str) -> bool:
         """
@@ -89,77 +388,390 @@ class WebCrawler(Crawler):
         :param url: URL to check against robots.txt
         :return: True if allowed, False if disallowed
         """
-        domain = urlparse(url).netloc
-
-        if domain not in self.robots_cache:
-            self.robots_cache[domain] = self.__fetch_robots_txt(domain)
-
-        disallowed_paths = self.robots_cache[domain]
-        path = urlparse(url).path
-
-        if disallowed_paths is None:
+        if not self.obey_robots or self.robots.is_allowed(url):
             return True
+        logger.debug("Skipping URL due to robots.txt disallow: %s", url)
+        METRICS.count("crawler.disallowed")
+        return False
 
-        for disallowed in disallowed_paths:
-            if path.startswith(disallowed):
-                print(f"Skipping URL due to robots.txt disallow: {url}")
-                return False
+    def __crawl_delay(self, url: str) -> float:
+        """Return the Crawl-delay the URL's host asks for, if any."""
+        return self.robots.crawl_delay(url) if self.obey_robots else None
 
-        return True
+    def __host_delay(self, url: str) -> float:
+        """
+        Return the delay between requests to the URL's host without blocking,
+        or None while its robots.txt, and so its Crawl-delay, has not arrived.
+        """
+        if not self.obey_robots:
+            return self.throttle.min_delay
+        rules = self.robots.prefetch(url)
+        if not rules.done():
+            return None
+        crawl_delay = rules.result().crawl_delay
+        return self.throttle.min_delay if crawl_delay is None else max(self.throttle.min_delay, crawl_delay)
 
     def crawl(self, urls: list) -> dict:
+        if self.workers > 1 or self.checkpoint_path:
+            return self._run(self._crawl_frontier, urls)
+        return self._run(self._crawl_sequential, urls)
+
+    def resume(self, path: str) -> dict:
+        """
+        Continue a crawl from a checkpoint written during an earlier `crawl`.
+        Completed URLs are not fetched again, so the returned link_map only holds the
+        pages crawled after the checkpoint; earlier pages are in the earlier run's sink.
+        :param path: Checkpoint file to resume from
+        :return: The link_map of the resumed part of the crawl
+        """
+        with open(path, "r") as file:
+            checkpoint = json.load(file)
+        if checkpoint.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"{path} has checkpoint version {checkpoint.get('version')}, "
+                             f"expected {CHECKPOINT_VERSION}")
+
+        prefix = os.path.join(os.path.dirname(path), checkpoint["log_prefix"])
+        self.visited = VisitedSet(read_fingerprints(prefix + ".visited", checkpoint["visited_count"]))
+        scheduled = VisitedSet(read_fingerprints(prefix + ".scheduled", checkpoint["scheduled_count"]))
+
+        self.depth = checkpoint["depth"]
+        self.robots.load_dict(checkpoint["robots_cache"])
+        frontier = deque((url, current_depth) for url, current_depth in checkpoint["frontier"])
+        if self.checkpoint_path is None:
+            self.checkpoint_path = path
+        return self._run(self._drain_frontier, frontier, scheduled)
+
+    def _crawl_sequential(self, urls: list) -> None:
         for url in urls:
             if url not in self.visited:
                 self._crawl_recursive(url, 0, is_main_url=True)
 
+    def _run(self, crawl_function, *args) -> dict:
+        """Run a crawl strategy with fresh stats and the record sink open."""
+        self.stats = {"requests": 0, "connections_reused": 0, "not_modified": 0, "bytes_saved": 0}
+        reused_before = self.adapter.connections_reused
+        self.sink = RecordSink(self.sink_path) if self.sink_path else None
+
+        try:
+            crawl_function(*args)
+        finally:
+            if self.sink:
+                self.sink.close()
+                self.sink = None
+            # Also reached on interruption, so the validators collected so far are kept
+            if self.validator_cache:
+                self.validator_cache.save()
+
+        # Includes the robots.txt requests, which share the session
+        self.stats["connections_reused"] = self.adapter.connections_reused - reused_before
+
         self._cleanup_link_map()
         return self.link_map
 
+    def _increment_stat(self, name: str, value: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[name] += value
+
+    def _emit(self, record: dict) -> None:
+        """Write a crawl record to the sink, if any."""
+        if self.sink:
+            self.sink.write(record)
+
+    def _make_record(self, url: str, document: str, sub_links: list, current_depth: int, status: str,
+                     fetch_time: float) -> dict:
+        return {
+            "url": url,
+            "document": document,
+            "sub_links": sub_links,
+            "depth": current_depth,
+            "status": status,
+            "fetch_time": fetch_time
+        }
+
+    def _download(self, url: str, is_main_url: bool) -> tuple:
+        """
+        Fetch a page through the pooled session, revalidating it against the
+        validator cache when possible. On a 304 the cached document and links
+        are reused without downloading or normalizing the page again.
+        :param url: URL to fetch
+        :param is_main_url: Whether the normalized document is needed
+        :return: Tuple of (document, links)
+        """
+        headers = {}
+        cached = self.validator_cache.get(url) if self.validator_cache else None
+        if cached and (not is_main_url or cached["document"] is not None):
+            headers = self.validator_cache.headers(cached)
+
+        with METRICS.span("crawler.fetch"):
+            response = self.session.get(url, timeout=TIMEOUT, headers=headers)
+        self._increment_stat("requests")
+        METRICS.count("crawler.requests")
+
+        if response.status_code == 304 and headers:
+            self._increment_stat("not_modified")
+            self._increment_stat("bytes_saved", cached["size"])
+            return (cached["document"] if is_main_url else None), cached["links"]
+
+        # One parse yields both the document text and the links
+        with METRICS.span("crawler.extract"):
+            document, links = extract_page(response.text, url, need_text=is_main_url, backend=self.html_backend)
+        if self.validator_cache:
+            self.validator_cache.put(url, response, document, links)
+        return document, links
+
+    def _fetch_page(self, url: str, current_depth: int) -> dict:
+        """
+        Fetch a single page and extract its document and cross-domain links.
+        Runs on a worker thread, so it must not touch the shared crawl state. Politeness
+        delays are enforced by the dispatcher in `_drain_frontier` before the page is submitted.
+        :param url: URL to fetch
+        :param current_depth: Depth of the URL in the crawl
+        :return: The crawl record for the URL
+        """
+        parent_domain = urlparse(url).netloc
+        if not self.__is_allowed_by_robots(url):
+            return self._make_record(url, None, [], current_depth, STATUS_DISALLOWED, 0.0)
+        logger.info("Crawling: %s Depth: %d", url, current_depth)
+        start = time.perf_counter()
+        try:
+            document, links = self._download(url, current_depth == 0)
+        except requests.Timeout:
+            logger.warning("Timeout reached for URL: %s. Moving on.", url)
+            METRICS.count("crawler.timeouts")
+            return self._make_record(url, None, [], current_depth, STATUS_TIMEOUT, time.perf_counter() - start)
+        except requests.RequestException as e:
+            logger.warning("Error crawling %s: %s", url, e)
+            METRICS.count("crawler.errors")
+            return self._make_record(url, None, [], current_depth, STATUS_ERROR, time.perf_counter() - start)
+        fetch_time = time.perf_counter() - start
+
+        sub_links = []
+        for link in links:
+            if urlparse(link).netloc != parent_domain:
+                sub_links.append(link)
+            else:
+                logger.debug("Skipping link (same domain): %s", link)
+
+        return self._make_record(url, document, sub_links, current_depth, STATUS_OK, fetch_time)
+
+    def _crawl_frontier(self, urls: list) -> None:
+        """
+        Crawl breadth-first from an explicit frontier drained by a pool of worker threads.
+        At most `per_host_limit` requests are in flight for any host, and requests to
+        the same host are spaced at least `host_delay` seconds, or its Crawl-delay, apart.
+        """
+        frontier = deque()
+        scheduled = VisitedSet(self.visited.fingerprints)
+        for url in urls:
+            if url not in scheduled:
+                scheduled.add(url)
+                frontier.append((url, 0))
+        if self.obey_robots:
+            for url, _ in frontier:
+                self.robots.prefetch(url)
+        self._drain_frontier(frontier, scheduled)
+
+    def _drain_frontier(self, frontier: deque, scheduled: VisitedSet) -> None:
+        """
+        Crawl every (url, depth) pair of the frontier, appending newly discovered links to it.
+        URLs are queued per host in a HostFrontier and only submitted once their host is ready,
+        so workers never sleep for politeness; until then the dispatcher waits for a completed
+        page or for the next host to become ready. The first request to a host whose robots.txt
+        has not arrived holds the host until it completes, so its Crawl-delay is always honored.
+        When checkpointing is enabled the crawl state is saved every `checkpoint_every` pages
+        or `checkpoint_interval` seconds, and once more when the crawl finishes or is interrupted.
+        """
+        frontier = HostFrontier(frontier, self.per_host_limit)
+        in_flight = {}
+        pages_since_checkpoint = 0
+        last_checkpoint = time.monotonic()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                while frontier or in_flight:
+                    now = time.monotonic()
+                    while len(in_flight) < self.workers:
+                        entry = frontier.pop(now)
+                        if entry is None:
+                            break
+                        url, current_depth, host = entry
+                        if self.__is_skipped(url):
+                            frontier.skip(host, now)
+                            continue
+
+                        delay = self.__host_delay(url)
+                        if delay is not None and not self.__is_allowed_by_robots(url):
+                            record = self._make_record(url, None, [], current_depth, STATUS_DISALLOWED, 0.0)
+                            self._handle_record(record, frontier, scheduled)
+                            frontier.skip(host, now)
+                            continue
+
+                        frontier.start(host, now, delay)
+                        future = executor.submit(self._fetch_page, url, current_depth)
+                        in_flight[future] = (url, current_depth, host, now)
+
+                    timeout = frontier.next_wakeup(now)
+                    if not in_flight:
+                        # Every queued host waits for its politeness delay
+                        time.sleep(timeout or 0)
+                        continue
+
+                    done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        # Only leave in_flight once fully handled, so an interrupted page is re-queued
+                        record = future.result()
+                        self._handle_record(record, frontier, scheduled)
+                        url, current_depth, host, started = in_flight.pop(future)
+                        delay = 0.0 if record["status"] == STATUS_DISALLOWED else self.__host_delay(url)
+                        frontier.finish(host, started, self.throttle.min_delay if delay is None else delay,
+                                        time.monotonic())
+                        pages_since_checkpoint += 1
+
+                    if self.checkpoint_path and self._checkpoint_due(pages_since_checkpoint, last_checkpoint):
+                        pending = [(url, current_depth) for url, current_depth, _, _ in in_flight.values()]
+                        self.save_checkpoint(self.checkpoint_path, pending + list(frontier), scheduled)
+                        pages_since_checkpoint = 0
+                        last_checkpoint = time.monotonic()
+        finally:
+            # Also reached on interruption: requests still in flight go back to the frontier
+            if self.checkpoint_path:
+                pending = [(url, current_depth) for url, current_depth, _, _ in in_flight.values()]
+                self.save_checkpoint(self.checkpoint_path, pending + list(frontier), scheduled)
+                self.visited.journal = None
+                self._checkpoint_logs = None
+
+    def _checkpoint_due(self, pages_since_checkpoint: int, last_checkpoint: float) -> bool:
+        if self.checkpoint_every and pages_since_checkpoint >= self.checkpoint_every:
+            return True
+        return bool(self.checkpoint_interval) and time.monotonic() - last_checkpoint >= self.checkpoint_interval
+
+    def _handle_record(self, record: dict, frontier: HostFrontier, scheduled: VisitedSet) -> None:
+        """Store a fetched page and queue its links for the next depth."""
+        self._emit(record)
+        if record["status"] != STATUS_OK:
+            return
+
+        url, current_depth = record["url"], record["depth"]
+        self.visited.add(url)
+        if self.keep_link_map:
+            self.link_map[url] = {
+                "document": record["document"],
+                "sub_links": record["sub_links"]
+            }
+        if current_depth + 1 > self.depth:
+            return
+        for link in record["sub_links"]:
+            if link not in scheduled:
+                scheduled.add(link)
+                frontier.append((link, current_depth + 1))
+                if self.obey_robots:
+                    # Fetch robots.txt of new hosts while the link waits in the frontier
+                    self.robots.prefetch(link)
+
+    def save_checkpoint(self, path: str, frontier: list, scheduled: VisitedSet) -> None:
+        """
+        Atomically write the crawl state needed by `resume` to a JSON file.
+        The visited and scheduled fingerprints go to binary logs next to it (`<path>.<id>.visited`
+        and `<path>.<id>.scheduled`). The first checkpoint of a crawl writes new logs, later ones
+        only append the fingerprints added since, and the JSON file records how many entries of
+        each log belong to it, so a checkpoint costs O(new pages + frontier) rather than O(crawl).
+        :param path: Checkpoint file to write
+        :param frontier: Pending (url, depth) pairs, including requests still in flight
+        :param scheduled: Fingerprints of every URL ever added to the frontier
+        """
+        logs = self._checkpoint_logs
+        if logs is None or logs[0] != path or self.visited.journal is None or scheduled.journal is None:
+            # New logs under a fresh name, so the previous checkpoint stays valid until it is replaced
+            prefix = f"{path}.{time.time_ns():x}"
+            self.visited.start_journal()
+            scheduled.start_journal()
+            write_fingerprints(prefix + ".visited", self.visited.fingerprints)
+            write_fingerprints(prefix + ".scheduled", scheduled.fingerprints)
+            logs = self._checkpoint_logs = [path, prefix, len(self.visited), len(scheduled)]
+            new_logs = True
+        else:
+            new_logs = False
+            prefix = logs[1]
+            visited_journal, scheduled_journal = self.visited.take_journal(), scheduled.take_journal()
+            write_fingerprints(prefix + ".visited", visited_journal, "ab")
+            write_fingerprints(prefix + ".scheduled", scheduled_journal, "ab")
+            logs[2] += len(visited_journal)
+            logs[3] += len(scheduled_journal)
+
+        checkpoint = {
+            "version": CHECKPOINT_VERSION,
+            "depth": self.depth,
+            "log_prefix": os.path.basename(prefix),
+            "visited_count": logs[2],
+            "scheduled_count": logs[3],
+            "frontier": frontier,
+            "robots_cache": self.robots.to_dict()
+        }
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w") as file:
+            json.dump(checkpoint, file)
+        os.replace(temporary_path, path)
+        if new_logs:
+            self._remove_checkpoint_logs(path, keep_prefix=prefix)
+
+    @staticmethod
+    def _remove_checkpoint_logs(path: str, keep_prefix: str) -> None:
+        """Remove the fingerprint logs of earlier checkpoints at path."""
+        for suffix in (".visited", ".scheduled"):
+            for log_path in glob.glob(glob.escape(path) + ".*" + suffix):
+                log_id = log_path[len(path) + 1:-len(suffix)]
+                if "." not in log_id and log_path != keep_prefix + suffix:
+                    os.remove(log_path)
+
     def _crawl_recursive(self, url: str, current_depth: int, is_main_url: bool = False) -> None:
         if current_depth > self.depth or url in self.visited:
             return
-        print("Crawling:", url, "Depth:", current_depth)
+        logger.info("Crawling: %s Depth: %d", url, current_depth)
+        start = time.perf_counter()
         try:
             # Parse the domain of the current URL
             parent_domain = urlparse(url).netloc
 
             # Skip if the URL contains censored words or is a skip type
-            if self.__is_censored(url):
-                print(f"Skipping censored link: {url}")
+            if self.__is_skipped(url):
                 return
-            if self.__is_skip_type(url):
-                print(f"Skipping file link (skip type): {url}")
+            if not self.__is_allowed_by_robots(url):
+                self._emit(self._make_record(url, None, [], current_depth, STATUS_DISALLOWED, 0.0))
                 return
 
-            response = requests.get(url, timeout=TIMEOUT)
-            html = response.text
+            crawl_delay = self.__crawl_delay(url)
+            if crawl_delay:
+                self.throttle.wait(parent_domain, crawl_delay)
+            document, links = self._download(url, is_main_url)
+            fetch_time = time.perf_counter() - start
             self.visited.add(url)
 
-            document = self.normalize_html(html) if is_main_url else None
-            links = self.extract_links(html, url)
-
-            self.link_map[url] = {
+            entry = {
                 "document": document,
                 "sub_links": []
             }
+            if self.keep_link_map:
+                self.link_map[url] = entry
 
             for link in links:
                 child_domain = urlparse(link).netloc
 
-                # Check if link is allowed by robots.txt
-                # if not self.__is_allowed_by_robots(link):
-                #     continue
-
                 if child_domain != parent_domain:
                     self._crawl_recursive(link, current_depth + 1)
-                    self.link_map[url]["sub_links"].append(link)
+                    entry["sub_links"].append(link)
                 else:
-                    print(f"Skipping link (same domain): {link}")
+                    logger.debug("Skipping link (same domain): %s", link)
+
+            self._emit(self._make_record(url, document, entry["sub_links"], current_depth, STATUS_OK, fetch_time))
 
         except requests.Timeout:
-            print(f"Timeout reached for URL: {url}. Moving on.")
+            logger.warning("Timeout reached for URL: %s. Moving on.", url)
+            METRICS.count("crawler.timeouts")
+            self._emit(self._make_record(url, None, [], current_depth, STATUS_TIMEOUT, time.perf_counter() - start))
         except requests.RequestException as e:
-            print(f"Error crawling {url}: {e}")
+            logger.warning("Error crawling %s: %s", url, e)
+            METRICS.count("crawler.errors")
+            self._emit(self._make_record(url, None, [], current_depth, STATUS_ERROR, time.perf_counter() - start))
 
     def _cleanup_link_map(self) -> None:
         for url, data in list(self.link_map.items()):
@@ -0,0 +1,125 @@
+import re
+import zlib
+from typing import Dict, List
+
+import numpy as np
+
+THRESHOLD = 0.8  # estimated Jaccard similarity of shingle sets above which documents are duplicates
+NUM_PERMUTATIONS = 128  # MinHash signature length
+SHINGLE_SIZE = 5  # words per shingle
+LSH_RECALL = 0.99  # probability that a pair exactly at the threshold becomes a candidate
+SEED = 42
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_WORD_REGEX = re.compile(r"\w+")
+
+
+def shingle_hashes(text: str, shingle_size: int = SHINGLE_SIZE) -> np.ndarray:
+    """
+    Return the distinct hashes of the word shingles of a document, after lowercasing and
+    dropping punctuation. Documents shorter than one shingle form a single shingle.
+    """
+    words = _WORD_REGEX.findall(text.lower())
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    count = max(len(words) - shingle_size + 1, 1)
+    hashes = {zlib.crc32(" ".join(words[i:i + shingle_size]).encode("utf-8")) for i in range(count)}
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes)) % _MERSENNE_PRIME
+
+
+def choose_bands(threshold: float, num_permutations: int, recall: float = LSH_RECALL) -> tuple:
+    """
+    Pick the LSH banding (bands, rows per band) with the most rows per band, i.e. the fewest false
+    candidates, under which a pair at the similarity threshold still shares a band with the given
+    probability 1 - (1 - threshold ** rows) ** bands. Candidates are verified on the full signature.
+    """
+    best = (num_permutations, 1)
+    for rows in range(1, num_permutations + 1):
+        bands = num_permutations // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            best = (bands, rows)
+    return best
+
+
+class Deduplicator:
+    """
+    Near-duplicate detection with MinHash signatures and LSH banding.
+    Documents are added in order; a document whose estimated Jaccard similarity to the canonical
+    document of an existing cluster reaches the threshold joins that cluster as an alias,
+    otherwise it becomes the canonical document of a new cluster. Only canonical documents are
+    put in the band buckets, so each lookup compares against a few candidates rather than
+    every document seen so far.
+    """
+
+    def __init__(self, threshold: float = THRESHOLD, num_permutations: int = NUM_PERMUTATIONS,
+                 shingle_size: int = SHINGLE_SIZE, seed: int = SEED) -> None:
+        self.threshold = threshold
+        self.num_permutations = num_permutations
+        self.shingle_size = shingle_size
+        self.bands, self.rows = choose_bands(threshold, num_permutations)
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=(num_permutations, 1), dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=(num_permutations, 1), dtype=np.uint64)
+
+        self.buckets = {}  # (band, band signature bytes) -> list of canonical urls
+        self.signatures = {}  # canonical url -> MinHash signature
+        self.canonical = {}  # url -> canonical url of its cluster
+        self.aliases = {}  # canonical url -> list of duplicate urls
+        # postings_removed counts the distinct words of dropped documents, before stemming and stop words
+        self.stats = {"documents": 0, "duplicates": 0, "postings_removed": 0}
+
+    def signature(self, text: str) -> np.ndarray:
+        """Return the MinHash signature of a document, or None if it has no words."""
+        hashes = shingle_hashes(text, self.shingle_size)
+        if not len(hashes):
+            return None
+        return ((self._a * hashes + self._b) % _MERSENNE_PRIME).min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> list:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def add(self, url: str, text: str) -> str:
+        """
+        Add a document and return the canonical url of its cluster, which is url itself
+        unless the document is a near-duplicate of an earlier one.
+        """
+        if url in self.canonical:
+            return self.canonical[url]
+        self.stats["documents"] += 1
+        signature = self.signature(text)
+        if signature is None:
+            self.canonical[url] = url
+            return url
+
+        keys = self._band_keys(signature)
+        candidates = []
+        for key in keys:
+            for candidate in self.buckets.get(key, ()):
+                if candidate not in candidates:
+                    candidates.append(candidate)
+
+        for candidate in candidates:
+            if np.mean(self.signatures[candidate] == signature) >= self.threshold:
+                self.canonical[url] = candidate
+                self.aliases.setdefault(candidate, []).append(url)
+                self.stats["duplicates"] += 1
+                self.stats["postings_removed"] += len(set(_WORD_REGEX.findall(text.lower())))
+                return candidate
+
+        self.canonical[url] = url
+        self.signatures[url] = signature
+        for key in keys:
+            self.buckets.setdefault(key, []).append(url)
+        return url
+
+    def deduplicate(self, documents: Dict[str, str]) -> Dict[str, str]:
+        """
+        Return the canonical documents of url -> text, in input order, dropping near-duplicates.
+        The urls of the dropped documents are recorded in `aliases` under their canonical url.
+        """
+        return {url: text for url, text in documents.items() if self.add(url, text) == url}
+
+    def get_aliases(self, url: str) -> List[str]:
+        """Return the urls of the near-duplicates of a canonical url."""
+        return self.aliases.get(url, [])
@@ -1,17 +1,39 @@
-from dotenv import load_dotenv
+import copy
 import os
+import re
 import requests
 import json
+import logging
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
 
-load_dotenv()
+YACY_RATE = 5.0  # requests per second
+YACY_BURST = 5
+OPEN_SEARCH_RATE = 1.0  # requests per second
+OPEN_SEARCH_BURST = 10
+CACHE_SIZE = 1024  # cached queries
+CACHE_TTL = 15 * 60  # seconds
+TIMEOUT = 10  # seconds
 
-OPEN_SEARCH_API_KEY = os.getenv("OPEN_SEARCH_API_KEY")
-OPEN_SEARCH_CX = os.getenv("OPEN_SEARCH_CX")
-OPEN_SEARCH_BASE_URL = os.getenv("OPEN_SEARCH_BASE_URL")
-OPEN_SEARCH_ENDPOINT = os.getenv("OPEN_SEARCH_ENDPOINT")
-YACY_BASE_URL = os.getenv("YACY_BASE_URL")
-YACY_ENDPOINT = os.getenv("YACY_ENDPOINT")
+logger = logging.getLogger(__name__)
+
+_API_KEY_REGEX = re.compile(r"([?&]key=)[^&\s'\"]+")
+
+
+@lru_cache(maxsize=None)
+def _load_dotenv() -> None:
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+def get_setting(name: str) -> str:
+    """Read a setting from the environment, loading the .env file when a setting is first needed."""
+    _load_dotenv()
+    return os.getenv(name)
 
 
 class SearchEngine:
@@ -28,8 +50,8 @@ class SearchEngine:
 
 class SearchEngineYaCy(SearchEngine):
 
-    def __init__(self) -> None:
-        super().__init__(YACY_BASE_URL, YACY_ENDPOINT)
+    def __init__(self, base_url: str = None, endpoint: str = None) -> None:
+        super().__init__(base_url or get_setting("YACY_BASE_URL"), endpoint or get_setting("YACY_ENDPOINT"))
 
     def __parse_query(self, query: str) -> str:
         query = query.replace(" ", "+")
@@ -43,26 +65,49 @@ class SearchEngineYaCy(SearchEngine):
 
         return response
 
+    def request_urls(self, query: str) -> list:
+        """Return the request URLs that make up a search."""
+        return [self.__parse_query(query)]
+
+    def parse_response(self, response: dict) -> tuple:
+        """Return the (items, links) of a search response."""
+        items = []
+        for channel in response.get("channels", []):
+            items.extend(channel.get("items", []))
+        return items, [item["link"] for item in items if "link" in item]
+
 
 class SearchEngineOpenSearch(SearchEngine):
 
-    def __init__(self, limit: int = 100) -> None:
-        super().__init__(OPEN_SEARCH_BASE_URL, OPEN_SEARCH_ENDPOINT)
-        self.cx = OPEN_SEARCH_CX
-        self.api_key = OPEN_SEARCH_API_KEY
+    def __init__(self, limit: int = 100, base_url: str = None, endpoint: str = None, api_key: str = None,
+                 cx: str = None) -> None:
+        super().__init__(base_url or get_setting("OPEN_SEARCH_BASE_URL"),
+                         endpoint or get_setting("OPEN_SEARCH_ENDPOINT"))
+        self.cx = cx or get_setting("OPEN_SEARCH_CX")
+        self.api_key = api_key or get_setting("OPEN_SEARCH_API_KEY")
         self.limit = limit
 
     def __parse_query(self, query: str) -> str:
         query = query.replace(" ", "+")
         return f"{self.base_url}{self.endpoint}?key={self.api_key}&cx={self.cx}&q={query}"
 
-    def search(self, query: str) -> tuple:
+    def request_urls(self, query: str) -> list:
+        """Return the request URLs of every result page of a search."""
         query = self.__parse_query(query)
 
         collection = []
         for i in range(0, self.limit // 10):
             next_query = query + "&count=10" + "&start=" + str(i * 10 + 1)
             collection.append(next_query)
+        return collection
+
+    def parse_response(self, response: dict) -> tuple:
+        """Return the (items, links) of one result page."""
+        items = response.get("items", [])
+        return items, [item["link"] for item in items if "link" in item]
+
+    def search(self, query: str) -> tuple:
+        collection = self.request_urls(query)
 
         all_items = []
         links = []
@@ -79,3 +124,140 @@ class SearchEngineOpenSearch(SearchEngine):
                 pass
 
         return all_items, links
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` requests per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available and take it."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Reserve the token now, possibly going into debt, and wait for it outside the lock
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire `ttl` seconds after they were stored."""
+
+    def __init__(self, max_size: int = CACHE_SIZE, ttl: float = CACHE_TTL) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value) -> None:
+        with self._lock:
+            self.entries[key] = (value, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+class FederatedSearch:
+    """
+    Fans a query out to YaCy and every OpenSearch result page concurrently over one pooled
+    session. Each backend is paced by its own token bucket instead of fixed sleeps, links are
+    deduplicated across backends, and responses are cached by normalized query unless a backend
+    request failed, so a transient error does not stick for the cache TTL.
+    """
+
+    def __init__(self, yacy: SearchEngineYaCy = None, open_search: SearchEngineOpenSearch = None,
+                 workers: int = 8, cache: TTLCache = None) -> None:
+        self.engines = {
+            "yacy": (yacy or SearchEngineYaCy(), TokenBucket(YACY_RATE, YACY_BURST)),
+            "opensearch": (open_search or SearchEngineOpenSearch(), TokenBucket(OPEN_SEARCH_RATE, OPEN_SEARCH_BURST))
+        }
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.cache = cache or TTLCache()
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    @staticmethod
+    def normalize_link(link: str) -> str:
+        return link.rstrip("/")
+
+    def _fetch(self, name: str, url: str) -> tuple:
+        """Return the (items, links) of one backend request, or None if it failed."""
+        engine, bucket = self.engines[name]
+        bucket.acquire()
+        try:
+            response = self.session.get(url, timeout=TIMEOUT)
+            response.raise_for_status()  # e.g. a 429 quota error must not be cached as "no items"
+            return engine.parse_response(json.loads(response.text))
+        except (requests.RequestException, ValueError) as e:
+            # Request exceptions contain the URL, which holds the OpenSearch API key
+            logger.warning("Error querying %s: %s", name, _API_KEY_REGEX.sub(r"\1<redacted>", str(e)))
+            return None
+
+    def search(self, query: str) -> dict:
+        """
+        Search every backend concurrently.
+        :param query: Search query
+        :return: Dict with the deduplicated "links" in backend order, and the raw items of each backend
+        """
+        key = self.normalize_query(query)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+
+        futures = []
+        for name, (engine, _) in self.engines.items():
+            for url in engine.request_urls(key):
+                futures.append((name, self.executor.submit(self._fetch, name, url)))
+
+        result = {"links": []}
+        seen = set()
+        failed = False
+        for name in self.engines:
+            result[name] = []
+        for name, future in futures:
+            response = future.result()
+            if response is None:
+                failed = True
+                continue
+            items, links = response
+            result[name].extend(items)
+            for link in links:
+                normalized = self.normalize_link(link)
+                if normalized not in seen:
+                    seen.add(normalized)
+                    result["links"].append(link)
+
+        if not failed:
+            self.cache.put(key, copy.deepcopy(result))
+        return result
+
+    def close(self) -> None:
+        self.executor.shutdown()
+        self.session.close()
@@ -0,0 +1,162 @@
+import json
+import random
+import string
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SEED = 42
+HOST = "127.0.0.1"
+YACY_ENDPOINT = "/yacysearch.json"
+OPEN_SEARCH_ENDPOINT = "/customsearch/v1"
+ROBOTS_TXT = b"User-agent: *\nAllow: /\n"
+
+
+def synthetic_link_graph(num_hosts: int = 10, pages_per_host: int = 50, links_per_page: int = 10,
+                         seed: int = SEED) -> dict:
+    """
+    Generate a reproducible web graph. Link targets are drawn with a Zipf-like preference for
+    low page numbers, so a few pages collect most in-links as on the real web.
+    :return: (host, page) -> list of (host, page) link targets
+    """
+    rng = random.Random(seed)
+    pages = [(host, page) for host in range(num_hosts) for page in range(pages_per_host)]
+    weights = [1 / (page + 1) for _, page in pages]
+    return {source: rng.choices(pages, weights=weights, k=links_per_page) for source in pages}
+
+
+class FixtureWeb:
+    """
+    Serves a synthetic web graph from local HTTP servers, one per host on its own port, so every
+    host is a different netloc for the crawler. Page text is generated deterministically from the
+    seed and the page, and every host allows everything in its robots.txt. A separate stub server
+    answers YaCy and OpenSearch (Custom Search JSON) queries with links into the graph.
+    Use as a context manager, or call `start` and `stop`.
+    """
+
+    def __init__(self, num_hosts: int = 10, pages_per_host: int = 50, links_per_page: int = 10,
+                 words_per_page: int = 300, seed: int = SEED) -> None:
+        self.num_hosts = num_hosts
+        self.pages_per_host = pages_per_host
+        self.words_per_page = words_per_page
+        self.seed = seed
+        self.graph = synthetic_link_graph(num_hosts, pages_per_host, links_per_page, seed)
+        rng = random.Random(seed)
+        self.vocabulary = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10))) for _ in range(5000)]
+        self.ports = []
+        self.search_port = None
+        self._servers = []
+
+    def url(self, host: int, page: int) -> str:
+        return f"http://{HOST}:{self.ports[host]}/page{page}.html"
+
+    @property
+    def seed_urls(self) -> list:
+        """The first page of every host."""
+        return [self.url(host, 0) for host in range(self.num_hosts)]
+
+    @property
+    def search_base_url(self) -> str:
+        return f"http://{HOST}:{self.search_port}"
+
+    def page_text(self, host: int, page: int) -> str:
+        rng = random.Random(f"{self.seed}:{host}:{page}")
+        return " ".join(rng.choices(self.vocabulary, k=self.words_per_page))
+
+    def render_page(self, host: int, page: int) -> bytes:
+        text = self.page_text(host, page)
+        anchors = "\n".join(f'<li><a href="{self.url(*target)}">link</a></li>' for target in self.graph[(host, page)])
+        return (f"<!DOCTYPE html>\n<html>\n<head><title>Page {page} of host {host}</title>\n"
+                f"<script>window.page = {page};</script></head>\n<body>\n<nav><ul>\n{anchors}\n</ul></nav>\n"
+                f"<main><p>{text}</p></main>\n</body>\n</html>\n").encode("utf-8")
+
+    def search_results(self, query: str, count: int, start: int = 0) -> list:
+        """Return reproducible result links for a query."""
+        rng = random.Random(f"{self.seed}:{query}")
+        pages = list(self.graph)
+        return [self.url(*rng.choice(pages)) for _ in range(start + count)][start:]
+
+    def _page_handler(self, host: int):
+        web = self
+
+        class PageHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path == "/robots.txt":
+                    return self._send(200, ROBOTS_TXT, "text/plain")
+                if path.startswith("/page") and path.endswith(".html"):
+                    number = path[len("/page"):-len(".html")]
+                    if number.isdigit() and int(number) < web.pages_per_host:
+                        return self._send(200, web.render_page(host, int(number)), "text/html; charset=utf-8")
+                self._send(404, b"Not found", "text/plain")
+
+            def _send(self, status: int, body: bytes, content_type: str) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        return PageHandler
+
+    def _search_handler(self):
+        web = self
+
+        class SearchHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                params = parse_qs(parsed.query)
+                if parsed.path == YACY_ENDPOINT:
+                    query = params.get("query", [""])[0]
+                    count = int(params.get("maximumRecords", ["10"])[0])
+                    items = [{"link": link, "title": link} for link in web.search_results(query, count)]
+                    body = {"channels": [{"items": items}]}
+                elif parsed.path == OPEN_SEARCH_ENDPOINT:
+                    query = params.get("q", [""])[0]
+                    count = int(params.get("count", ["10"])[0])
+                    start = int(params.get("start", ["1"])[0]) - 1
+                    body = {"items": [{"link": link, "title": link}
+                                      for link in web.search_results(query, count, start)]}
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        return SearchHandler
+
+    def _serve(self, handler) -> int:
+        server = ThreadingHTTPServer((HOST, 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self._servers.append(server)
+        return server.server_address[1]
+
+    def start(self) -> "FixtureWeb":
+        """Start the page servers on free ports, and the search stub server."""
+        self.ports = [self._serve(self._page_handler(host)) for host in range(self.num_hosts)]
+        self.search_port = self._serve(self._search_handler())
+        return self
+
+    def stop(self) -> None:
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+
+    def __enter__(self) -> "FixtureWeb":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
@@ -1,26 +1,47 @@
-import networkx as nx
-import matplotlib.pyplot as plt
 import json
-import tldextract
+import logging
+import os
+import time
 import numpy as np
+from array import array
+from metrics import METRICS
+from url_filter import registered_domain
+from utils import iter_crawled_pages, read_crawl_records
+
+logger = logging.getLogger(__name__)
+
+COMPACT_EDGES = 1 << 16  # minimum number of pending edges before DomainGraphStore deduplicates them
+
+
+def edges_to_csr(sources: np.ndarray, targets: np.ndarray, num_nodes: int) -> tuple:
+    """
+    Convert an edge list of integer node ids to CSR arrays.
+    :return: Tuple of (indptr, indices) where the targets of node i are indices[indptr[i]:indptr[i + 1]]
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    order = np.argsort(sources, kind="stable")
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=num_nodes), out=indptr[1:])
+    return indptr, targets[order]
 
 
 class DomainGraph:
 
     def __init__(self) -> None:
+        import networkx as nx
         self.G = nx.DiGraph()
 
     def __extract_domain(self, url: str) -> str:
         """Helper function to extract the domain from a URL."""
-        extracted = tldextract.extract(url)
-        return f"{extracted.domain}.{extracted.suffix}"
+        return registered_domain(url)
 
-    def build_graph(self, data: dict) -> None:
-        """Build the directed graph from the provided data."""
+    def build_graph(self, data) -> None:
+        """Build the directed graph from the provided link_map, or from an iterable of crawl records."""
         gr = {}
 
         # Populate the graph dictionary by filtering for cross-domain links
-        for url, details in data.items():
+        for url, details in iter_crawled_pages(data):
             parent_domain = self.__extract_domain(url)
 
             if parent_domain not in gr:
@@ -40,38 +61,207 @@ class DomainGraph:
         """Return the list of node labels (domains) in order."""
         return list(self.G.nodes())
 
-    def draw_graph(self) -> None:
-        """Draw the graph using matplotlib."""
-        plt.figure(figsize=(15, 15))
-
-        pos = nx.spring_layout(self.G, seed=42)
-        node_colors = [hash(domain) % 10 for domain in self.G.nodes()]
+    def top_nodes(self, top_n: int, rank_by: str = "pagerank") -> list:
+        """
+        Return the top_n nodes ranked by "pagerank" (computed on the sparse engine) or by "degree".
+        Ties keep the node order of `get_node_labels`.
+        """
+        nodes = self.get_node_labels()
+        if rank_by == "pagerank":
+            scores = PersonalizedPageRank.from_domain_graph(self).calculate_pagerank()
+        elif rank_by == "degree":
+            scores = np.array([self.G.degree(node) for node in nodes])
+        else:
+            raise ValueError(f"Unknown rank_by: {rank_by}")
+        order = np.argsort(-np.asarray(scores), kind="stable")[:top_n]
+        return [nodes[i] for i in order]
+
+    def layout(self, graph, layout_path: str = None) -> dict:
+        """
+        Compute a spring layout for the graph. With a layout_path, positions are read from and
+        written back to that JSON file, so nodes keep their place across runs and only nodes
+        missing from the cache are positioned.
+        """
+        import networkx as nx
+
+        cached = {}
+        if layout_path and os.path.exists(layout_path):
+            with open(layout_path, "r") as file:
+                cached = {node: tuple(position) for node, position in json.load(file).items()}
+
+        pos = {node: cached[node] for node in graph.nodes() if node in cached}
+        if len(pos) < graph.number_of_nodes():
+            if pos:
+                pos = nx.spring_layout(graph, pos=pos, fixed=list(pos), seed=42)
+            else:
+                pos = nx.spring_layout(graph, seed=42)
+
+        if layout_path:
+            cached.update({node: [float(x), float(y)] for node, (x, y) in pos.items()})
+            with open(layout_path, "w") as file:
+                json.dump(cached, file)
+        return pos
+
+    def draw_graph(self, output_path: str = None, top_n: int = None, rank_by: str = "pagerank",
+                   layout_path: str = None, with_labels: bool = True) -> dict:
+        """
+        Draw the graph using matplotlib.
+        :param output_path: Write the image to this file (the format follows the extension, e.g. .png
+            or .svg) instead of opening a window, so drawing works on a headless server
+        :param top_n: Only draw the top_n nodes by `rank_by`, the layout is computed on that subgraph
+        :param rank_by: "pagerank" or "degree"
+        :param layout_path: JSON file caching node positions across runs
+        :param with_labels: Whether to draw the domain labels
+        :return: Seconds spent on the ("select", "layout", "draw") steps
+        """
+        # Plotting libraries are only imported when drawing
+        import matplotlib.pyplot as plt
+        import networkx as nx
+
+        timings = {}
+        start = time.perf_counter()
+        graph = self.G
+        if top_n is not None and top_n < graph.number_of_nodes():
+            graph = graph.subgraph(self.top_nodes(top_n, rank_by))
+        timings["select"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pos = self.layout(graph, layout_path)
+        timings["layout"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        figure = plt.figure(figsize=(15, 15))
+        node_colors = [hash(domain) % 10 for domain in graph.nodes()]
 
         # Draw nodes and edges
-        nx.draw_networkx_nodes(self.G, pos, node_size=50, node_color=node_colors, cmap=plt.cm.tab10)
-        nx.draw_networkx_edges(self.G, pos, edge_color='b', arrows=True, arrowstyle='->', arrowsize=10)
+        nx.draw_networkx_nodes(graph, pos, node_size=50, node_color=node_colors, cmap=plt.cm.tab10)
+        nx.draw_networkx_edges(graph, pos, edge_color='b', arrows=True, arrowstyle='->', arrowsize=10)
 
         # Draw labels for each node
-        nx.draw_networkx_labels(self.G, pos, font_size=8)
+        if with_labels:
+            nx.draw_networkx_labels(graph, pos, font_size=8)
 
         plt.axis("off")
-        plt.show()
+        if output_path:
+            figure.savefig(output_path, bbox_inches="tight")
+            plt.close(figure)
+        else:
+            plt.show()
+        timings["draw"] = time.perf_counter() - start
+
+        logger.info("Drew %d nodes and %d edges: select %.2fs, layout %.2fs, draw %.2fs", graph.number_of_nodes(),
+                    graph.number_of_edges(), timings["select"], timings["layout"], timings["draw"])
+        return timings
 
     def return_graph_matrix(self) -> np.ndarray:
         """Return the adjacency matrix of the graph."""
+        import networkx as nx
         return np.array(nx.adjacency_matrix(self.G).todense().tolist())
 
-    def draw_from_file(self, file_name: str) -> None:
+    def return_graph_csr(self) -> tuple:
+        """Return the adjacency of the graph as CSR arrays, in the node order of `get_node_labels`."""
+        index = {node: i for i, node in enumerate(self.G.nodes())}
+        edges = np.array([(index[u], index[v]) for u, v in self.G.edges()], dtype=np.int64).reshape(-1, 2)
+        return edges_to_csr(edges[:, 0], edges[:, 1], len(index))
+
+    def draw_from_file(self, file_name: str, **draw_options) -> None:
         """Load JSON data from a file and draw the graph."""
         with open(file_name, "r") as file:
             data = json.load(file)[0]  # Assuming the first element in the list is the relevant dictionary
         self.build_graph(data)
-        self.draw_graph()
+        self.draw_graph(**draw_options)
 
-    def draw_from_json(self, json_data: dict) -> None:
+    def draw_from_stream(self, file_name: str, **draw_options) -> None:
+        """Lazily read crawl records from a newline-delimited JSON file and draw the graph."""
+        self.build_graph(read_crawl_records(file_name))
+        self.draw_graph(**draw_options)
+
+    def draw_from_json(self, json_data: dict, **draw_options) -> None:
         """Draw the graph from directly provided JSON data."""
         self.build_graph(json_data[0])  # Assuming the first element in the list is the relevant dictionary
-        self.draw_graph()
+        self.draw_graph(**draw_options)
+
+
+class DomainGraphStore:
+    """
+    Compact, incrementally updatable domain graph. Domains are interned to integer ids and every
+    edge is packed into one integer (source << 32 | target), so new crawl output can be merged
+    without rebuilding, and CSR arrays for PageRank are exported without going through networkx.
+    New edges are appended to a pending array and deduplicated in bulk by sorting, once there are
+    as many pending edges as stored ones, so the graph takes about 8 bytes per unique edge.
+    Like `DomainGraph`, only domains that take part in a cross-domain edge become nodes.
+    """
+
+    def __init__(self) -> None:
+        self.domain_ids = {}
+        self.domains = []
+        self.edge_keys = np.zeros(0, dtype=np.int64)  # sorted, unique source << 32 | target
+        self._pending_keys = array("q")
+
+    def _intern(self, domain: str) -> int:
+        domain_id = self.domain_ids.get(domain)
+        if domain_id is None:
+            domain_id = len(self.domains)
+            self.domain_ids[domain] = domain_id
+            self.domains.append(domain)
+        return domain_id
+
+    def add_edge(self, parent_domain: str, child_domain: str) -> None:
+        """Add a domain edge. Duplicates are dropped on the next `compact`."""
+        self._pending_keys.append(self._intern(parent_domain) << 32 | self._intern(child_domain))
+        if len(self._pending_keys) >= max(COMPACT_EDGES, len(self.edge_keys)):
+            self.compact()
+
+    def compact(self) -> int:
+        """Merge the pending edges into the sorted edge keys, dropping duplicates. Returns the number of new edges."""
+        if not self._pending_keys:
+            return 0
+        num_edges = len(self.edge_keys)
+        pending_keys = np.frombuffer(self._pending_keys, dtype=np.int64)
+        self.edge_keys = np.unique(np.concatenate((self.edge_keys, pending_keys)))
+        self._pending_keys = array("q")
+        return len(self.edge_keys) - num_edges
+
+    def number_of_edges(self) -> int:
+        self.compact()
+        return len(self.edge_keys)
+
+    def edges(self) -> tuple:
+        """Return the (sources, targets) arrays of node ids of the deduplicated edges, sorted by source and target."""
+        self.compact()
+        return self.edge_keys >> 32, self.edge_keys & 0xFFFFFFFF
+
+    def add_crawl_records(self, records) -> int:
+        """
+        Merge crawl output into the graph.
+        :param records: A link_map, or an iterable of crawl records
+        :return: Number of new edges
+        """
+        num_edges = self.number_of_edges()
+        for url, details in iter_crawled_pages(records):
+            parent_domain = registered_domain(url)
+            for link in details.get("sub_links", []):
+                child_domain = registered_domain(link)
+                if child_domain and parent_domain != child_domain:
+                    self.add_edge(parent_domain, child_domain)
+        return self.number_of_edges() - num_edges
+
+    def get_node_labels(self) -> list:
+        """Return the list of node labels (domains) in id order."""
+        return list(self.domains)
+
+    def return_graph_csr(self) -> tuple:
+        """Return the adjacency of the graph as CSR arrays, in the node order of `get_node_labels`."""
+        sources, targets = self.edges()
+        return edges_to_csr(sources, targets, len(self.domains))
+
+    def to_domain_graph(self) -> DomainGraph:
+        """Convert to a networkx-backed DomainGraph, e.g. for drawing."""
+        graph = DomainGraph()
+        graph.G.add_nodes_from(self.domains)
+        graph.G.add_edges_from((self.domains[source], self.domains[target])
+                               for source, target in zip(*(ids.tolist() for ids in self.edges())))
+        return graph
 
 
 class PageRank:
@@ -130,3 +320,177 @@ class PageRank:
             print(f"Node: {node}, Score: {score:.6f}")
 
         return sorted_scores
+
+
+class CsrPageRank(PageRank):
+    """
+    Base of the PageRank variants over CSR adjacency arrays. It only holds the arrays and the
+    iteration settings; each subclass defines its own random surfer parameters.
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, node_labels: list, max_iterations: int = 100,
+                 tol: float = 1e-6) -> None:
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.node_labels = node_labels
+        self.max_iterations = max_iterations
+        self.tol = tol
+        self.page_rank_scores = None
+        self.iterations = 0
+        self.residual = None
+
+    @classmethod
+    def from_domain_graph(cls, graph: DomainGraph, **kwargs) -> "CsrPageRank":
+        indptr, indices = graph.return_graph_csr()
+        return cls(indptr, indices, graph.get_node_labels(), **kwargs)
+
+
+class SparsePageRank(CsrPageRank):
+    """
+    PageRank over CSR adjacency arrays. Produces the same scores as `PageRank` without
+    building the dense adjacency or teleportation matrices: memory is O(N + E) and each
+    iteration is a single pass over the edges. As in `PageRank`, `epsilon` is the teleport probability.
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, node_labels: list, epsilon: float = 0.85,
+                 max_iterations: int = 100, tol: float = 1e-6) -> None:
+        super().__init__(indptr, indices, node_labels, max_iterations, tol)
+        self.epsilon = epsilon
+
+    def normalize_matrix(self) -> np.ndarray:
+        """Return the weight of every CSR entry, i.e. the adjacency normalized by column sums."""
+        num_nodes = len(self.node_labels)
+        column_sums = np.bincount(self.indices, minlength=num_nodes).astype(float)
+        column_sums[column_sums == 0] = 1  # Avoid division by zero for dangling nodes
+        return 1 / column_sums[self.indices]
+
+    def calculate_pagerank(self) -> np.ndarray:
+        num_nodes = len(self.node_labels)
+        rank_scores = np.full(num_nodes, 1 / num_nodes) if num_nodes else np.zeros(0)
+        rows = np.repeat(np.arange(num_nodes), np.diff(self.indptr))
+        weights = self.normalize_matrix()
+
+        self.iterations = 0
+        self.residual = None
+        for _ in range(self.max_iterations):
+            with METRICS.span("pagerank.iteration"):
+                # Link contribution plus teleportation, applied without materializing either matrix
+                link_scores = np.bincount(rows, weights=weights * rank_scores[self.indices], minlength=num_nodes)
+                new_rank_scores = (1 - self.epsilon) * link_scores \
+                    + self.epsilon * rank_scores.sum() / max(num_nodes, 1)
+
+                self.iterations += 1
+                self.residual = float(np.abs(new_rank_scores - rank_scores).max()) if num_nodes else 0.0
+                rank_scores = new_rank_scores
+            if self.residual <= self.tol:
+                break
+
+        logger.info("PageRank stopped after %d iterations with residual %.2e", self.iterations, self.residual)
+        return rank_scores
+
+
+class PersonalizedPageRank(CsrPageRank):
+    """
+    Standard PageRank over CSR adjacency arrays: with probability `damping` a surfer follows an
+    out-link of the current node, otherwise it jumps according to the teleport vector, which is
+    uniform or a personalization (topic-sensitive) vector. Dangling nodes also jump according to
+    the teleport vector. Iteration stops when the L1 residual drops below `tol`, and can be
+    warm-started from a previous score vector. Several teleport vectors can be computed at once,
+    one per column of a score matrix.
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, node_labels: list, damping: float = 0.85,
+                 max_iterations: int = 100, tol: float = 1e-6) -> None:
+        super().__init__(indptr, indices, node_labels, max_iterations, tol)
+        self.damping = damping
+        num_nodes = len(node_labels)
+        self.sources = np.repeat(np.arange(num_nodes), np.diff(self.indptr))
+        self.out_degrees = np.diff(self.indptr).astype(float)
+        self.dangling = self.out_degrees == 0
+
+    def normalize_matrix(self) -> np.ndarray:
+        """Return the weight of every CSR entry: each node splits its score evenly over its out-links."""
+        return 1 / self.out_degrees[self.sources]
+
+    def _as_vector(self, values, default: np.ndarray) -> np.ndarray:
+        """Turn a {label: weight} dict or an array into a vector normalized to sum to 1."""
+        if values is None:
+            return default
+        if isinstance(values, dict):
+            index = {label: i for i, label in enumerate(self.node_labels)}
+            vector = np.zeros(len(self.node_labels))
+            for label, weight in values.items():
+                vector[index[label]] = weight
+        else:
+            vector = np.array(values, dtype=float)
+        total = vector.sum()
+        if total <= 0:
+            raise ValueError("A personalization or start vector needs a positive total weight")
+        return vector / total
+
+    def teleport_matrix(self, personalizations: list = None) -> np.ndarray:
+        """Stack teleport vectors as the columns of an N x K matrix; None gives one uniform column."""
+        num_nodes = len(self.node_labels)
+        uniform = np.full(num_nodes, 1 / num_nodes) if num_nodes else np.zeros(0)
+        if personalizations is None:
+            return uniform[:, None]
+        return np.column_stack([self._as_vector(values, uniform) for values in personalizations])
+
+    def calculate_pagerank_batch(self, personalizations: list = None, initial: np.ndarray = None) -> np.ndarray:
+        """
+        Run the power iteration for several teleport vectors at once.
+        :param personalizations: List of {label: weight} dicts or arrays, one per column; None for uniform
+        :param initial: Optional N x K (or N for a single column) warm-start scores, e.g. from a previous run
+        :return: N x K matrix of scores, each column summing to 1
+        """
+        teleport = self.teleport_matrix(personalizations)
+        num_nodes, num_columns = teleport.shape
+        if initial is None:
+            rank_scores = teleport.copy()
+        else:
+            rank_scores = np.array(initial, dtype=float).reshape(num_nodes, -1)
+            rank_scores = np.broadcast_to(rank_scores, teleport.shape) / rank_scores.sum(axis=0)
+
+        weights = self.normalize_matrix()[:, None]
+        # Flattened (target, column) bins, so one bincount pushes every column along the edges
+        bins = (self.indices[:, None] * num_columns + np.arange(num_columns)).ravel()
+
+        self.iterations = 0
+        self.residual = 0.0
+        for _ in range(self.max_iterations):
+            with METRICS.span("pagerank.iteration"):
+                link_scores = np.bincount(bins, weights=(rank_scores[self.sources] * weights).ravel(),
+                                          minlength=num_nodes * num_columns).reshape(num_nodes, num_columns)
+                dangling_mass = rank_scores[self.dangling].sum(axis=0)
+                new_rank_scores = self.damping * (link_scores + dangling_mass * teleport) \
+                    + (1 - self.damping) * teleport
+
+                self.iterations += 1
+                self.residual = float(np.abs(new_rank_scores - rank_scores).sum(axis=0).max()) if num_nodes else 0.0
+                rank_scores = new_rank_scores
+            if self.residual < self.tol:
+                break
+
+        logger.info("PageRank stopped after %d iterations with residual %.2e", self.iterations, self.residual)
+        return rank_scores
+
+    def calculate_pagerank(self, personalization=None, initial=None) -> np.ndarray:
+        personalizations = None if personalization is None else [personalization]
+        if isinstance(initial, dict):
+            initial = self._as_vector(initial, None)
+        return self.calculate_pagerank_batch(personalizations, initial)[:, 0]
+
+    def get_pagerank(self, personalization=None, initial=None) -> dict:
+        """
+        :param personalization: Optional {label: weight} teleport preferences
+        :param initial: Optional warm-start scores, as a {label: score} dict or an array
+        :return: Dict mapping each node to its score
+        """
+        self.page_rank_scores = self.calculate_pagerank(personalization, initial)
+        return {self.node_labels[i]: self.page_rank_scores[i] for i in range(len(self.node_labels))}
+
+    def get_pagerank_batch(self, personalizations: list, initial: np.ndarray = None) -> list:
+        """Return one {label: score} dict per personalization, computed in a single batched iteration."""
+        scores = self.calculate_pagerank_batch(personalizations, initial)
+        return [{self.node_labels[i]: scores[i, column] for i in range(len(self.node_labels))}
+                for column in range(scores.shape[1])]
@@ -0,0 +1,123 @@
+from functools import lru_cache
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from metrics import METRICS
+
+SKIPPED_TAGS = {"script", "style"}  # elements whose content is not visible text
+LINK_SCHEMES = ("http://", "https://")
+
+
+@lru_cache(maxsize=None)
+def load_lxml():
+    """Import lxml on first use, returning None when it is not installed."""
+    try:
+        import lxml.html
+        return lxml
+    except ImportError:
+        return None
+
+
+def collapse_whitespace(text: str) -> str:
+    """Collapse every run of whitespace into a single space, in one pass."""
+    return " ".join(text.split())
+
+
+def _absolute_links(hrefs, base_url: str) -> list:
+    links = []
+    for href in hrefs:
+        href = href.strip()
+        if not href or href.startswith("#"):
+            continue
+        link = urljoin(base_url, href)
+        if link.startswith(LINK_SCHEMES):
+            links.append(link)
+    return links
+
+
+class _PageParser(HTMLParser):
+    """Streaming tokenizer that collects visible text and link targets in one pass."""
+
+    def __init__(self, need_text: bool) -> None:
+        super().__init__(convert_charrefs=True)
+        self.need_text = need_text
+        self.text = []
+        self.hrefs = []
+        self.base_href = None
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag == "a" or (tag == "base" and self.base_href is None):
+            for name, value in attrs:
+                if name == "href" and value:
+                    if tag == "a":
+                        self.hrefs.append(value)
+                    else:
+                        self.base_href = value
+                    break
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data: str) -> None:
+        if self.need_text and not self._skip_depth:
+            self.text.append(data)
+
+
+def _extract_with_html_parser(html: str, base_url: str, need_text: bool) -> tuple:
+    with METRICS.span("html.parse"):
+        parser = _PageParser(need_text)
+        parser.feed(html)
+        parser.close()
+        text = collapse_whitespace("".join(parser.text)) if need_text else None
+    with METRICS.span("html.links"):
+        if parser.base_href:
+            base_url = urljoin(base_url, parser.base_href)
+        return text, _absolute_links(parser.hrefs, base_url)
+
+
+def _extract_with_lxml(html: str, base_url: str, need_text: bool) -> tuple:
+    with METRICS.span("html.parse"):
+        document = load_lxml().html.document_fromstring(html)
+    with METRICS.span("html.links"):
+        base = document.find(".//base[@href]")
+        if base is not None:
+            base_url = urljoin(base_url, base.get("href"))
+        hrefs = [anchor.get("href") for anchor in document.iter("a") if anchor.get("href")]
+        links = _absolute_links(hrefs, base_url)
+
+    text = None
+    if need_text:
+        with METRICS.span("html.text"):
+            for element in list(document.iter(*SKIPPED_TAGS)):
+                element.drop_tree()
+            text = collapse_whitespace(document.text_content())
+    return text, links
+
+
+def extract_page(html: str, base_url: str, need_text: bool = True, backend: str = None) -> tuple:
+    """
+    Extract the visible text and the absolute http(s) links of a page from a single parse.
+    Text inside script and style elements is dropped and whitespace is collapsed; relative
+    links are resolved against the page URL, or its <base href> when present.
+    :param html: Page source
+    :param base_url: URL the page was fetched from
+    :param need_text: Whether to collect the text, links are always extracted
+    :param backend: "lxml" or "html.parser"; defaults to lxml when it is installed
+    :return: Tuple of (text or None, links)
+    """
+    lxml = load_lxml() if backend in (None, "lxml") else None
+    if backend is None:
+        backend = "lxml" if lxml is not None else "html.parser"
+    if backend == "lxml":
+        if lxml is None:
+            raise ImportError("The lxml backend requires the lxml package")
+        try:
+            return _extract_with_lxml(html, base_url, need_text)
+        except (ValueError, lxml.etree.ParserError):
+            # Empty documents and strings with an XML encoding declaration
+            pass
+    return _extract_with_html_parser(html, base_url, need_text)
@@ -0,0 +1,64 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from metrics import METRICS
+from preprocessor import CachedPreprocessor
+from vector_space import VectorSpace
+
+SHARD_SIZE = 500  # documents per task sent to a worker process
+
+_worker_preprocessor = None
+
+
+def _init_worker() -> None:
+    """Load the NLTK resources once per worker process."""
+    global _worker_preprocessor
+    _worker_preprocessor = CachedPreprocessor()
+
+
+def _index_shard(shard: list) -> list:
+    """
+    Preprocess a shard of (name, text) pairs and compute each document's TF weights.
+    :return: List of (name, tokens, term weights) in shard order
+    """
+    vector_space = VectorSpace()
+    results = []
+    for doc_name, text in shard:
+        tokens = _worker_preprocessor.preprocess(text)
+        results.append((doc_name, tokens, vector_space.calculate_term_weights(tokens)))
+    return results
+
+
+def build_vector_space(documents: dict, workers: int = 1, shard_size: int = SHARD_SIZE) -> VectorSpace:
+    """
+    Preprocess documents and build a VectorSpace index over them.
+    With more than one worker, documents are sharded across a process pool where each worker
+    tokenizes its shard and computes the TF weights, and the parent merges the shards in input
+    order, so the index is identical to the serial build.
+    :param documents: Document name -> raw text, e.g. from extract_documents_from_crawled_data
+    :param workers: Number of worker processes, 1 builds serially in this process
+    :param shard_size: Number of documents per shard
+    :return: The built VectorSpace
+    """
+    vector_space = VectorSpace()
+
+    if workers <= 1:
+        preprocessor = CachedPreprocessor()
+        with METRICS.span("indexer.preprocess"):
+            docs = {doc_name: preprocessor.preprocess(text) for doc_name, text in documents.items()}
+        vector_space.set_docs(docs)
+        return vector_space
+
+    items = list(documents.items())
+    shards = [items[i:i + shard_size] for i in range(0, len(items), shard_size)]
+
+    docs = {}
+    term_weights = {}
+    with METRICS.span("indexer.preprocess"), \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        for shard in executor.map(_index_shard, shards):
+            for doc_name, tokens, weights in shard:
+                docs[doc_name] = tokens
+                term_weights[doc_name] = weights
+
+    vector_space.set_docs(docs, term_weights)
+    return vector_space
@@ -0,0 +1,132 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import nullcontext
+
+METRICS_PREFIX = "irse"  # prefix of the metric names in the Prometheus text format
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics: "Metrics", name: str) -> None:
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+
+
+class Metrics:
+    """
+    In-process registry of named counters and timing spans, safe to share between threads.
+    While disabled, `span` returns a shared no-op context manager and `count` returns at once,
+    so instrumented hot paths only pay for one attribute check.
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.counters = {}
+        self.spans = {}  # name -> [count, total seconds, max seconds]
+        self._lock = threading.Lock()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters = {}
+            self.spans = {}
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Add value to a counter."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record one timing of a span."""
+        with self._lock:
+            span = self.spans.get(name)
+            if span is None:
+                self.spans[name] = [1, seconds, seconds]
+            else:
+                span[0] += 1
+                span[1] += seconds
+                if seconds > span[2]:
+                    span[2] = seconds
+
+    def span(self, name: str):
+        """Context manager timing the enclosed block under name."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def snapshot(self) -> dict:
+        """Return the current counters and span timings as JSON-serializable data."""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "spans": {name: {"count": count, "total_seconds": total, "max_seconds": maximum,
+                                 "mean_seconds": total / count}
+                          for name, (count, total, maximum) in self.spans.items()}
+            }
+
+    def to_prometheus(self) -> str:
+        """Return the snapshot in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            metric = _metric_name(name) + "_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for name, span in sorted(snapshot["spans"].items()):
+            metric = _metric_name(name) + "_seconds"
+            lines += [f"# TYPE {metric} summary", f"{metric}_count {span['count']}",
+                      f"{metric}_sum {span['total_seconds']}",
+                      f"# TYPE {metric}_max gauge", f"{metric}_max {span['max_seconds']}"]
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str, format: str = None) -> None:
+        """
+        Atomically write the snapshot to a file.
+        :param format: "json" or "prometheus", by default "prometheus" for .prom files and "json" otherwise
+        """
+        if format is None:
+            format = "prometheus" if path.endswith(".prom") else "json"
+        if format == "prometheus":
+            text = self.to_prometheus()
+        elif format == "json":
+            text = json.dumps(self.snapshot(), indent=2)
+        else:
+            raise ValueError(f"Unknown metrics format: {format}")
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w") as file:
+            file.write(text)
+        os.replace(temporary_path, path)
+
+
+def _metric_name(name: str) -> str:
+    return f"{METRICS_PREFIX}_" + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def configure_logging(level=logging.INFO) -> None:
+    """Send the log records of every module to stderr at the given level."""
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+
+
+# Shared registry used by the instrumented modules, disabled until `METRICS.enable()`
+METRICS = Metrics()
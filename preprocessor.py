@@ -1,11 +1,17 @@
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import WordNetLemmatizer, PorterStemmer
+import re
+from functools import cached_property, lru_cache
+from typing import Iterable, Iterator
 
 from constants import EMPTY, SPACE
+from metrics import METRICS
+
+# Matches exactly the characters remove_punctuation drops: not alphanumeric and not whitespace
+PUNCTUATION_REGEX = re.compile(r"[^\w\s]|_")
+TOKEN_CACHE_SIZE = 100_000
 
 
 class Preprocessor:
+    """Text preprocessing with NLTK, which is only imported when a step first needs it."""
 
     def case_fold(self, string: str) -> str:
         """Converts the string to lowercase"""
@@ -13,6 +19,7 @@ class Preprocessor:
 
     def remove_stopwords(self, string: str) -> str:
         """Removes the stopwords from the string using NLTK's stopwords"""
+        from nltk.corpus import stopwords
         stop_words = set(stopwords.words('english'))
         return SPACE.join([word for word in string.split() if word not in stop_words])
 
@@ -26,16 +33,19 @@ class Preprocessor:
 
     def stem_string(self, tokens: list) -> list:
         """Stems the tokens using Porter Stemmer"""
+        from nltk.stem import PorterStemmer
         stemmer = PorterStemmer()
         return [stemmer.stem(word) for word in tokens]
 
     def lemmatize(self, tokens: list) -> list:
         """Lemmatizes the tokens using WordNet Lemmatizer"""
+        from nltk.stem import WordNetLemmatizer
         lemmatizer = WordNetLemmatizer()
         return [lemmatizer.lemmatize(word) for word in tokens]
 
     def tokenize(self, string: str) -> list:
         """Tokenizes the string"""
+        from nltk.tokenize import word_tokenize
         return word_tokenize(string)
 
     def preprocess(self, string: str) -> list:
@@ -48,11 +58,74 @@ class Preprocessor:
         6. Stemming
         7. Lemmatization
         """
-        string = self.case_fold(string)
-        string = self.expand_contractions(string)
-        string = self.remove_punctuation(string)
-        string = self.remove_stopwords(string)
-        tokens = self.tokenize(string)
-        tokens = self.stem_string(tokens)
-        tokens = self.lemmatize(tokens)
-        return tokens
+        with METRICS.span("preprocess"):
+            string = self.case_fold(string)
+            string = self.expand_contractions(string)
+            string = self.remove_punctuation(string)
+            string = self.remove_stopwords(string)
+            tokens = self.tokenize(string)
+            tokens = self.stem_string(tokens)
+            tokens = self.lemmatize(tokens)
+            return tokens
+
+
+class CachedPreprocessor(Preprocessor):
+    """Preprocessor that loads its NLTK resources once, on first use, and memoizes stemming
+    and lemmatization. Produces exactly the same tokens as Preprocessor.preprocess.
+    """
+
+    def __init__(self, cache_size: int = TOKEN_CACHE_SIZE) -> None:
+        self.normalize_token = lru_cache(maxsize=cache_size)(self._normalize_token)
+
+    @cached_property
+    def stop_words(self) -> frozenset:
+        from nltk.corpus import stopwords
+        return frozenset(stopwords.words('english'))
+
+    @cached_property
+    def stemmer(self):
+        from nltk.stem import PorterStemmer
+        return PorterStemmer()
+
+    @cached_property
+    def lemmatizer(self):
+        from nltk.stem import WordNetLemmatizer
+        return WordNetLemmatizer()
+
+    def remove_stopwords(self, string: str) -> str:
+        """Removes the stopwords from the string using the preloaded stopwords"""
+        stop_words = self.stop_words
+        return SPACE.join([word for word in string.split() if word not in stop_words])
+
+    def remove_punctuation(self, string: str) -> str:
+        """Removes the punctuation from the string with a single regex pass"""
+        return PUNCTUATION_REGEX.sub(EMPTY, string)
+
+    def _normalize_token(self, token: str) -> str:
+        return self.lemmatizer.lemmatize(self.stemmer.stem(token))
+
+    def stem_string(self, tokens: list) -> list:
+        """Stems the tokens using the preloaded Porter Stemmer"""
+        return [self.stemmer.stem(word) for word in tokens]
+
+    def lemmatize(self, tokens: list) -> list:
+        """Lemmatizes the tokens using the preloaded WordNet Lemmatizer"""
+        return [self.lemmatizer.lemmatize(word) for word in tokens]
+
+    def preprocess(self, string: str) -> list:
+        """Preprocesses the string with the same steps as Preprocessor.preprocess,
+        stemming and lemmatizing each distinct token only once per cache lifetime.
+        """
+        with METRICS.span("preprocess"):
+            string = self.case_fold(string)
+            string = self.expand_contractions(string)
+            string = self.remove_punctuation(string)
+            string = self.remove_stopwords(string)
+            tokens = self.tokenize(string)
+            normalize_token = self.normalize_token
+            return [normalize_token(token) for token in tokens]
+
+    def preprocess_many(self, strings: Iterable[str]) -> Iterator[list]:
+        """Lazily preprocesses every string of a corpus, sharing the token cache between them"""
+        for string in strings:
+            yield self.preprocess(string)
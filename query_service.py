@@ -0,0 +1,67 @@
+import heapq
+import json
+from typing import List
+
+from metrics import METRICS
+from preprocessor import CachedPreprocessor
+from url_filter import registered_domain
+from vector_space import VectorSpace
+
+ALPHA = 0.8  # weight of the cosine score, PageRank gets the rest
+CANDIDATE_FACTOR = 10  # candidates retrieved from the index per requested result
+
+
+def save_pagerank_table(scores: dict, path: str) -> None:
+    """Write per-domain PageRank scores, e.g. from PageRank.get_pagerank, to a JSON file."""
+    with open(path, "w") as file:
+        json.dump({domain: float(score) for domain, score in scores.items()}, file)
+
+
+def load_pagerank_table(path: str) -> dict:
+    """Load per-domain PageRank scores, scaled so that the best domain scores 1."""
+    with open(path, "r") as file:
+        scores = json.load(file)
+    best = max(scores.values(), default=0)
+    if best <= 0:
+        return {domain: 0.0 for domain in scores}
+    return {domain: score / best for domain, score in scores.items()}
+
+
+class QueryService:
+    """
+    Answers queries from a prebuilt index and a precomputed per-domain PageRank table,
+    both loaded once. Candidates come from the posting lists of the query terms only,
+    and are re-ranked by `alpha * cosine + (1 - alpha) * pagerank` of their domain.
+    """
+
+    def __init__(self, index_path: str, pagerank_path: str, alpha: float = ALPHA,
+                 candidate_factor: int = CANDIDATE_FACTOR) -> None:
+        self.index = VectorSpace.load(index_path)
+        self.pagerank = load_pagerank_table(pagerank_path)
+        self.alpha = alpha
+        self.candidate_factor = candidate_factor
+        self.preprocessor = None
+
+    def search(self, query: str, top_k: int = 10) -> List[tuple]:
+        """Preprocess a raw query and return its top_k results."""
+        if self.preprocessor is None:
+            self.preprocessor = CachedPreprocessor()
+        return self.search_tokens(self.preprocessor.preprocess(query), top_k)
+
+    def search_tokens(self, query_tokens: List[str], top_k: int = 10) -> List[tuple]:
+        """
+        Rank documents for already preprocessed query tokens.
+        :return: List of (url, score, cosine score, pagerank score), best first
+        """
+        with METRICS.span("query_service.search"):
+            candidates = self.index.rank_documents(query_tokens, top_k=top_k * self.candidate_factor)
+
+            results = []
+            for url, cosine in candidates:
+                pagerank = self.pagerank.get(registered_domain(url), 0.0)
+                score = self.alpha * cosine + (1 - self.alpha) * pagerank
+                results.append((url, score, cosine, pagerank))
+            return heapq.nlargest(top_k, results, key=lambda result: result[1])
+
+    def close(self) -> None:
+        self.index.close()
@@ -0,0 +1,213 @@
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from urllib.parse import urlparse
+
+import requests
+
+USER_AGENT = "ir-se-crawler"
+ROBOTS_TTL = 24 * 60 * 60  # seconds before a cached robots.txt is fetched again
+ROBOTS_WORKERS = 4  # concurrent robots.txt fetches
+TIMEOUT = 10  # seconds
+
+logger = logging.getLogger(__name__)
+
+_PRODUCT_TOKEN_REGEX = re.compile(r"[A-Za-z_-]+")
+
+# Trie keys that cannot collide with path characters
+RULE = None  # rule ending at this node, matches any path with this prefix
+END_RULE = ""  # rule ending at this node with a "$" anchor, matches only this exact path
+
+
+class RobotsRules:
+    """
+    Allow/Disallow rules of the robots.txt group that applies to one user agent.
+    Plain rules are compiled into a character trie, so a check walks the path once and
+    keeps the deepest (longest) matching rule; the rare rules with `*` wildcards are
+    compiled into regexes. As in RFC 9309 the longest match wins and Allow wins ties.
+    """
+
+    def __init__(self, rules: list = None, crawl_delay: float = None) -> None:
+        self.crawl_delay = crawl_delay
+        self.trie = {}
+        self.wildcard_rules = []
+        for allow, pattern in rules or []:
+            self.add_rule(allow, pattern)
+
+    def add_rule(self, allow: bool, pattern: str) -> None:
+        if not pattern:
+            # An empty Disallow allows everything, and an empty Allow matches nothing
+            return
+        if "*" in pattern:
+            regex = ".*".join(re.escape(part) for part in pattern.rstrip("$").split("*"))
+            regex += "$" if pattern.endswith("$") else ""
+            self.wildcard_rules.append((len(pattern), allow, re.compile(regex)))
+            return
+
+        anchored = pattern.endswith("$")
+        node = self.trie
+        for char in pattern.rstrip("$") if anchored else pattern:
+            node = node.setdefault(char, {})
+        key = END_RULE if anchored else RULE
+        # Allow wins over a Disallow with the same pattern
+        node[key] = node.get(key, False) or allow
+
+    def is_allowed(self, path: str) -> bool:
+        best_length, best_allow = -1, True
+
+        node = self.trie
+        depth = 0
+        for char in path:
+            if RULE in node:
+                best_length, best_allow = depth, node[RULE]
+            node = node.get(char)
+            if node is None:
+                break
+            depth += 1
+        else:
+            for key in (RULE, END_RULE):
+                if key in node and (depth > best_length or node[key]):
+                    best_length, best_allow = depth, node[key]
+
+        for length, allow, regex in self.wildcard_rules:
+            if length >= best_length and regex.match(path):
+                if length > best_length or allow:
+                    best_length, best_allow = length, allow
+
+        return best_allow
+
+
+def parse_robots_txt(text: str, user_agent: str = USER_AGENT) -> RobotsRules:
+    """
+    Parse a robots.txt file and return the rules of the group that applies to the user agent.
+    As in RFC 9309, that is the group whose user-agent equals the product token of ours (its
+    leading `[A-Za-z_-]+` characters), compared case-insensitively, else the `*` group.
+    Groups naming the same user agent are merged.
+    """
+    groups = []  # list of (agents, rules, crawl_delay)
+    agents, rules, crawl_delay = [], [], None
+    in_rules = False
+
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if ":" not in line:
+            continue
+        field, value = line.split(":", 1)
+        field, value = field.strip().lower(), value.strip()
+
+        if field == "user-agent":
+            if in_rules:
+                groups.append((agents, rules, crawl_delay))
+                agents, rules, crawl_delay = [], [], None
+                in_rules = False
+            agents.append(value.lower())
+        elif field in ("allow", "disallow") and agents:
+            in_rules = True
+            rules.append((field == "allow", value))
+        elif field == "crawl-delay" and agents:
+            in_rules = True
+            try:
+                crawl_delay = float(value)
+            except ValueError:
+                pass
+    if agents:
+        groups.append((agents, rules, crawl_delay))
+
+    match = _PRODUCT_TOKEN_REGEX.match(user_agent)
+    product_token = match.group().lower() if match else ""
+    best_agent = "*"
+    if product_token and any(product_token in group_agents for group_agents, _, _ in groups):
+        best_agent = product_token
+
+    selected_rules, selected_delay = [], None
+    for group_agents, group_rules, group_delay in groups:
+        if best_agent in group_agents:
+            selected_rules.extend(group_rules)
+            if group_delay is not None:
+                selected_delay = group_delay
+    return RobotsRules(selected_rules, selected_delay)
+
+
+class RobotsCache:
+    """
+    Per-host cache of parsed robots.txt rules.
+    Files are fetched on a small thread pool, so `prefetch` can request the rules of a host
+    as soon as it is discovered, and `get` only blocks if they have not arrived yet.
+    Entries are fetched again once they are older than the TTL.
+    """
+
+    def __init__(self, session: requests.Session = None, user_agent: str = USER_AGENT, ttl: float = ROBOTS_TTL,
+                 workers: int = ROBOTS_WORKERS) -> None:
+        self.session = session or requests.Session()
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.texts = {}  # host -> (robots.txt text, fetch time)
+        self.rules = {}  # host -> RobotsRules
+        self._pending = {}  # host -> Future
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def _is_fresh(self, host: str) -> bool:
+        return host in self.rules and time.time() - self.texts[host][1] < self.ttl
+
+    def _fetch(self, scheme: str, host: str) -> RobotsRules:
+        robots_url = f"{scheme}://{host}/robots.txt"
+        text = ""
+        try:
+            response = self.session.get(robots_url, timeout=TIMEOUT)
+            if response.status_code == 200:
+                text = response.text
+            else:
+                logger.info("No robots.txt found for domain: %s", host)
+        except requests.RequestException as e:
+            logger.warning("Error fetching robots.txt for %s: %s", host, e)
+
+        rules = parse_robots_txt(text, self.user_agent)
+        with self._lock:
+            self.texts[host] = (text, time.time())
+            self.rules[host] = rules
+            self._pending.pop(host, None)
+        return rules
+
+    def prefetch(self, url: str) -> Future:
+        """Start fetching the robots.txt of the URL's host unless it is cached or already requested."""
+        parsed = urlparse(url)
+        host = parsed.netloc
+        with self._lock:
+            if host in self._pending:
+                return self._pending[host]
+            if self._is_fresh(host):
+                future = Future()
+                future.set_result(self.rules[host])
+                return future
+            future = self._executor.submit(self._fetch, parsed.scheme or "http", host)
+            self._pending[host] = future
+            return future
+
+    def get(self, url: str) -> RobotsRules:
+        """Return the rules for the URL's host, fetching them if needed."""
+        return self.prefetch(url).result()
+
+    def is_allowed(self, url: str) -> bool:
+        parsed = urlparse(url)
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+        return self.get(url).is_allowed(path)
+
+    def crawl_delay(self, url: str) -> float:
+        return self.get(url).crawl_delay
+
+    def to_dict(self) -> dict:
+        """Return the cached robots.txt files as JSON-serializable data."""
+        with self._lock:
+            return {host: [text, fetched_at] for host, (text, fetched_at) in self.texts.items()}
+
+    def load_dict(self, data: dict) -> None:
+        """Restore robots.txt files saved with `to_dict`; expired entries are fetched again on use."""
+        with self._lock:
+            for host, (text, fetched_at) in data.items():
+                self.texts[host] = (text, fetched_at)
+                self.rules[host] = parse_robots_txt(text, self.user_agent)
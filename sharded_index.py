@@ -0,0 +1,161 @@
+import heapq
+import math
+import multiprocessing
+from typing import Dict, List
+
+from vector_space import VectorSpace, weight_query
+
+NUM_SHARDS = 4
+
+
+class ShardVectorSpace(VectorSpace):
+    """
+    VectorSpace over one shard of a corpus that weights terms with collection-wide IDF values,
+    so its normalized document vectors are the same as in an index of the whole corpus.
+    """
+
+    def _reset(self) -> None:
+        super()._reset()
+        self.global_total_docs = 0
+        self.global_doc_freqs = {}
+
+    def set_collection_stats(self, total_docs: int, doc_freqs: Dict[str, int]) -> None:
+        """Set the number of documents and the document frequencies of the whole corpus."""
+        self.global_total_docs = total_docs
+        self.global_doc_freqs = doc_freqs
+        self._stale = True
+
+    def local_doc_freqs(self) -> Dict[str, int]:
+        return {term: len(postings) for term, postings in self.inverted_index.items()}
+
+    def _calculate_idfs(self):
+        self.total_docs = self.global_total_docs
+        for term in self.inverted_index:
+            self.idf_values[term] = self._calculate_idf(self.global_doc_freqs.get(term, 0))
+
+
+def _serve_shard(connection) -> None:
+    """Worker process loop: apply the coordinator's commands to one shard until told to close."""
+    shard = ShardVectorSpace()
+    while True:
+        command, args = connection.recv()
+        if command == "close":
+            connection.close()
+            return
+        if command == "reset":
+            shard._reset()
+            connection.send(None)
+        elif command == "add_docs":
+            shard.add_docs(*args)
+            connection.send(shard.local_doc_freqs())
+        elif command == "set_collection_stats":
+            shard.set_collection_stats(*args)
+            shard._refresh_weights()
+            connection.send(None)
+        elif command == "rank_query_vector":
+            connection.send(shard.rank_query_vector(*args))
+
+
+class ShardedVectorSpace:
+    """
+    Index partitioned across worker processes, each owning a ShardVectorSpace.
+    Documents are assigned to shards round-robin in insertion order. After every change the
+    coordinator sums the shards' document frequencies and sends back the collection-wide
+    statistics, so documents are weighted exactly as in a single VectorSpace. A query is
+    weighted once here, fanned out to all shards at once, and their top_k lists are merged,
+    so results and scores are identical to `VectorSpace.rank_documents`.
+    """
+
+    def __init__(self, num_shards: int = NUM_SHARDS) -> None:
+        self.num_shards = num_shards
+        self.doc_ids = {}  # Document name -> insertion order, used to break ties like VectorSpace
+        self.doc_shards = {}  # Document name -> shard index
+        self.doc_freqs = {}  # Term -> collection-wide document frequency
+        self.shard_doc_freqs = [{} for _ in range(num_shards)]
+        self._connections = []
+        self._processes = []
+        for _ in range(num_shards):
+            parent_connection, child_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_serve_shard, args=(child_connection,), daemon=True)
+            process.start()
+            child_connection.close()
+            self._connections.append(parent_connection)
+            self._processes.append(process)
+
+    def _broadcast(self, command: str, args_per_shard: list) -> list:
+        """Send one command to every shard, then wait for all the replies."""
+        for connection, args in zip(self._connections, args_per_shard):
+            connection.send((command, args))
+        return [connection.recv() for connection in self._connections]
+
+    def set_docs(self, docs: Dict[str, List[str]], term_weights: Dict[str, Dict[str, float]] = None) -> None:
+        self.doc_ids = {}
+        self.doc_shards = {}
+        self._broadcast("reset", [()] * self.num_shards)
+        self.add_docs(docs, term_weights)
+
+    def add_docs(self, docs: Dict[str, List[str]], term_weights: Dict[str, Dict[str, float]] = None) -> None:
+        """Add documents to their shards, updating documents that already exist, like `VectorSpace.add_docs`."""
+        shard_docs = [{} for _ in range(self.num_shards)]
+        shard_weights = [{} if term_weights else None for _ in range(self.num_shards)]
+        for doc_name, tokens in docs.items():
+            if doc_name not in self.doc_ids:
+                self.doc_ids[doc_name] = len(self.doc_ids)
+                self.doc_shards[doc_name] = self.doc_ids[doc_name] % self.num_shards
+            shard = self.doc_shards[doc_name]
+            shard_docs[shard][doc_name] = tokens
+            if term_weights and doc_name in term_weights:
+                shard_weights[shard][doc_name] = term_weights[doc_name]
+
+        self.shard_doc_freqs = self._broadcast("add_docs", list(zip(shard_docs, shard_weights)))
+        self.doc_freqs = {}
+        for local_doc_freqs in self.shard_doc_freqs:
+            for term, doc_freq in local_doc_freqs.items():
+                self.doc_freqs[term] = self.doc_freqs.get(term, 0) + doc_freq
+
+        # Every shard only needs the frequencies of its own terms
+        total_docs = len(self.doc_ids)
+        self._broadcast("set_collection_stats", [
+            (total_docs, {term: self.doc_freqs[term] for term in local_doc_freqs})
+            for local_doc_freqs in self.shard_doc_freqs])
+
+    def _build_query_vector(self, query_tokens: List[str]) -> Dict[str, float]:
+        # Same weighting as VectorSpace._build_query_vector, with collection-wide statistics
+        def idf_lookup(term: str) -> float:
+            if term not in self.doc_freqs:
+                return None
+            return math.log10(len(self.doc_ids) / float(self.doc_freqs[term]))
+
+        return weight_query(query_tokens, idf_lookup)
+
+    def rank_documents(self, query_tokens: List[str], top_k: int = None,
+                       include_zero_scores: bool = False) -> List[tuple]:
+        """Rank documents across all shards, see `VectorSpace.rank_documents`."""
+        query_vector = self._build_query_vector(query_tokens)
+        shard_results = self._broadcast("rank_query_vector",
+                                        [(query_vector, top_k, include_zero_scores)] * self.num_shards)
+
+        def rank_key(result):
+            return result[1], -self.doc_ids[result[0]]
+
+        results = [result for shard_result in shard_results for result in shard_result]
+        if top_k is None:
+            return sorted(results, key=rank_key, reverse=True)
+        return heapq.nlargest(top_k, results, key=rank_key)
+
+    def close(self) -> None:
+        """Stop the shard worker processes."""
+        for connection, process in zip(self._connections, self._processes):
+            try:
+                connection.send(("close", ()))
+            except (BrokenPipeError, OSError):
+                pass
+            connection.close()
+            process.join()
+        self._connections, self._processes = [], []
+
+    def __enter__(self) -> "ShardedVectorSpace":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
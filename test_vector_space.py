@@ -0,0 +1,58 @@
+import random
+import unittest
+
+from vector_space import VectorSpace
+
+SEED = 42
+VOCABULARY = [f"term{i}" for i in range(60)]
+
+
+def random_tokens(rng: random.Random) -> list:
+    return rng.choices(VOCABULARY, k=rng.randint(1, 30))
+
+
+class IncrementalIndexTest(unittest.TestCase):
+    """Incremental add_docs / update_doc / remove_doc must rank exactly like a full rebuild."""
+
+    def assert_matches_rebuild(self, vector_space: VectorSpace, rng: random.Random) -> None:
+        # Rebuild in document id order, so ties are broken the same way
+        rebuilt = VectorSpace()
+        rebuilt.set_docs({name: vector_space.docs[name] for name in vector_space.doc_names.values()})
+        for _ in range(20):
+            query = random_tokens(rng)[:5]
+            self.assertEqual(vector_space.rank_documents(query, include_zero_scores=True),
+                             rebuilt.rank_documents(query, include_zero_scores=True))
+            self.assertEqual(vector_space.rank_documents(query, top_k=5), rebuilt.rank_documents(query, top_k=5))
+
+    def test_random_operations_match_rebuild(self):
+        rng = random.Random(SEED)
+        vector_space = VectorSpace()
+        vector_space.set_docs({f"doc{i}": random_tokens(rng) for i in range(20)})
+        next_doc = 20
+        for step in range(200):
+            operation = rng.random()
+            if operation < 0.4 or len(vector_space.docs) < 2:
+                batch = {f"doc{next_doc + i}": random_tokens(rng) for i in range(rng.randint(1, 3))}
+                next_doc += len(batch)
+                vector_space.add_docs(batch)
+            elif operation < 0.7:
+                vector_space.update_doc(rng.choice(list(vector_space.docs)), random_tokens(rng))
+            else:
+                vector_space.remove_doc(rng.choice(list(vector_space.docs)))
+            if step % 20 == 0:
+                self.assert_matches_rebuild(vector_space, rng)
+        self.assert_matches_rebuild(vector_space, rng)
+
+    def test_add_docs_updates_existing_documents(self):
+        vector_space = VectorSpace()
+        vector_space.set_docs({"a": ["x", "y"], "b": ["y", "z"]})
+        vector_space.add_docs({"a": ["z"], "c": ["x", "x"]})
+        rebuilt = VectorSpace()
+        rebuilt.set_docs({"a": ["z"], "b": ["y", "z"], "c": ["x", "x"]})
+        for query in (["x"], ["y"], ["z"], ["x", "z"]):
+            self.assertEqual(vector_space.rank_documents(query, include_zero_scores=True),
+                             rebuilt.rank_documents(query, include_zero_scores=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
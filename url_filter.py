@@ -0,0 +1,66 @@
+import re
+from functools import lru_cache
+
+from censor import get_censor_list, get_skip_types
+
+DOMAIN_CACHE_SIZE = 100_000  # hosts whose registered domain is memoized
+
+_NETLOC_PREFIX_REGEX = re.compile(r"(?:[A-Za-z][A-Za-z0-9+.-]*:)?//")  # "scheme://" or "//"
+
+
+class UrlFilter:
+    """
+    Decides in a single pass whether a URL should be skipped by the crawler.
+    The URL is lowercased once, the censor words are compiled into one regex alternation
+    instead of one substring scan per word, and the skip types into a single suffix tuple
+    checked by one `endswith` call.
+    """
+
+    def __init__(self, censor_list: list = None, skip_types: list = None) -> None:
+        censor_list = get_censor_list() if censor_list is None else censor_list
+        skip_types = get_skip_types() if skip_types is None else skip_types
+
+        words = [re.escape(word.lower()) for word in censor_list]
+        self.censor_regex = re.compile("|".join(words)) if words else None
+        self.skip_suffixes = tuple(extension.lower() for extension in skip_types)
+
+    def _is_censored(self, lowered_url: str) -> bool:
+        return self.censor_regex is not None and self.censor_regex.search(lowered_url) is not None
+
+    def is_censored(self, url: str) -> bool:
+        """Check if the URL contains a censored word."""
+        return self._is_censored(url.lower())
+
+    def is_skip_type(self, url: str) -> bool:
+        """Check if the URL ends with a file type that should be skipped."""
+        return url.lower().endswith(self.skip_suffixes)
+
+    def is_skipped(self, url: str) -> bool:
+        """Check if the URL is censored or a skip type."""
+        lowered_url = url.lower()
+        return self._is_censored(lowered_url) or lowered_url.endswith(self.skip_suffixes)
+
+
+@lru_cache(maxsize=DOMAIN_CACHE_SIZE)
+def _extract_host(host: str) -> tuple:
+    # Imported on first use, loading tldextract and its suffix list is a large part of startup
+    import tldextract
+    extracted = tldextract.extract(host)
+    return extracted.domain, extracted.suffix
+
+
+def extract_registered_domain(url: str) -> tuple:
+    """
+    Return the (domain, suffix) pair of a URL, e.g. ("example", "co.uk").
+    Results are memoized per host, so tldextract runs once for every distinct host.
+    """
+    if _NETLOC_PREFIX_REGEX.match(url):
+        # Cheaper than urlsplit: "scheme://host/path" splits into ["scheme:", "", "host", "path"]
+        return _extract_host(url.split("/", 3)[2])
+    return _extract_host(url.split("/", 1)[0])
+
+
+def registered_domain(url: str) -> str:
+    """Return the registered domain of a URL, e.g. "example.co.uk"."""
+    domain, suffix = extract_registered_domain(url)
+    return f"{domain}.{suffix}"
@@ -1,22 +1,54 @@
-from constants import EMPTY
-import tldextract
+import json
+from typing import Iterable, Iterator, Union
 
+from constants import EMPTY, STATUS_OK
+from url_filter import extract_registered_domain
 
-def extract_documents_from_crawled_data(data: dict) -> dict:
-    """Extract relevant documents from the crawled data."""
-    documents = {}
-    for url, details in data.items():
+
+def read_crawl_records(file_name: str) -> Iterator[dict]:
+    """Lazily read crawl records from a newline-delimited JSON file written by the crawler."""
+    with open(file_name, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_crawled_pages(data: Union[dict, Iterable[dict]]) -> Iterator[tuple]:
+    """
+    Iterate over (url, details) pairs of successfully crawled pages.
+    :param data: Either a crawler link_map, or an iterable of crawl records
+    """
+    if isinstance(data, dict):
+        yield from data.items()
+        return
+    for record in data:
+        if record.get("status", STATUS_OK) == STATUS_OK:
+            yield record["url"], record
+
+
+def iter_documents_from_crawled_data(data: Union[dict, Iterable[dict]]) -> Iterator[tuple]:
+    """Lazily yield (url, document) pairs of the relevant documents in the crawled data."""
+    for url, details in iter_crawled_pages(data):
         try:
             document = details["document"]
             if document and document != EMPTY:
-                documents[url] = document
+                yield url, document
         except KeyError:
             pass
-    return documents
+
+
+def extract_documents_from_crawled_data(data: Union[dict, Iterable[dict]], deduplicator=None) -> dict:
+    """
+    Extract relevant documents from the crawled data.
+    :param deduplicator: Optional dedup.Deduplicator, only the canonical document of every
+        near-duplicate cluster is kept and the others are recorded as its aliases
+    """
+    documents = iter_documents_from_crawled_data(data)
+    if deduplicator is not None:
+        return {url: document for url, document in documents if deduplicator.add(url, document) == url}
+    return dict(documents)
 
 
 def is_same_domain(url1: str, url2: str) -> bool:
     """Check if two URLs belong to the same domain."""
-    extracted1 = tldextract.extract(url1)
-    extracted2 = tldextract.extract(url2)
-    return extracted1.domain == extracted2.domain and extracted1.suffix == extracted2.suffix
+    return extract_registered_domain(url1) == extract_registered_domain(url2)
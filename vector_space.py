@@ -1,21 +1,118 @@
+import heapq
 import math
-from typing import Dict, List
+import mmap
+import struct
+from array import array
+from typing import Callable, Dict, List, Optional
+
+from metrics import METRICS
+
+INDEX_MAGIC = b"VSIX"
+INDEX_VERSION = 1
+INDEX_BYTE_ORDER_MARK = 0x01020304
+# magic, version, byte order mark, number of docs, terms and postings, then the section offsets.
+# Sections are written in native byte order, so the mark tells readers whether they can map them.
+INDEX_HEADER = struct.Struct("=4sIIxxxxQQQ8Q")
+
+
+def _rank_scores(scores: Dict[int, float], top_k: int = None) -> List[tuple]:
+    """Sort (doc_id, score) pairs best first, breaking ties by ascending doc_id."""
+    def rank_key(item):
+        return item[1], -item[0]
+
+    if top_k is None:
+        return sorted(scores.items(), key=rank_key, reverse=True)
+    return heapq.nlargest(top_k, scores.items(), key=rank_key)
+
+
+def weight_query(query_tokens: List[str], idf_lookup: Callable[[str], Optional[float]]) -> Dict[str, float]:
+    """
+    Weight query terms by (1 + log10 tf) * idf and normalize the vector to unit length.
+    Every index weights its queries here, so their scores stay identical to `VectorSpace.rank_documents`.
+    :param idf_lookup: Returns the IDF of a term, or None for a term that is not in the index
+    :return: Term -> weight in order of first occurrence, without the terms missing from the index
+    """
+    query_freqs = {}
+    for term in query_tokens:
+        query_freqs[term] = query_freqs.get(term, 0) + 1
+
+    query_vector = {}
+    for term, freq in query_freqs.items():
+        idf = idf_lookup(term)
+        if idf is not None:
+            query_vector[term] = (1 + math.log10(freq)) * idf
+
+    query_length = math.sqrt(sum(weight * weight for weight in query_vector.values()))
+    if query_length > 0:
+        for term in query_vector:
+            query_vector[term] /= query_length
+    return query_vector
+
+
+def _pad(data: bytes) -> bytes:
+    """Pad a section to a multiple of 8 bytes so the next one stays aligned."""
+    return data + b"\0" * (-len(data) % 8)
 
 
 class VectorSpace:
     def __init__(self):
+        self._reset()
+
+    def _reset(self) -> None:
         self.inverted_index = {}
         self.doc_vectors = {}
         self.doc_lengths = {}
         self.total_docs = 0
         self.docs = {}
         self.idf_values = {}  # Added IDF cache
+        self.doc_ids = {}  # Document name -> stable document id
+        self.doc_names = {}  # Stable document id -> document name
+        self._next_doc_id = 0
+        self._stale = False  # Whether IDF values and norms need refreshing
 
-    def set_docs(self, docs: Dict[str, List[str]]) -> None:
-        self.docs = docs
-        self.total_docs = len(docs)
-        self._build_index()
-        self._calculate_idfs()  # Calculate IDF values once
+    def set_docs(self, docs: Dict[str, List[str]], term_weights: Dict[str, Dict[str, float]] = None) -> None:
+        with METRICS.span("index.build"):
+            self._reset()
+            self.add_docs(docs, term_weights)
+            self._refresh_weights()  # Calculate IDF values once
+
+    def add_docs(self, docs: Dict[str, List[str]], term_weights: Dict[str, Dict[str, float]] = None) -> None:
+        """
+        Add documents to the index. Documents that already exist are updated.
+        :param docs: Document name -> tokens
+        :param term_weights: Optional document name -> TF weights already computed with
+            `calculate_term_weights`, e.g. by worker processes
+        """
+        for doc_name, tokens in docs.items():
+            doc_vector = term_weights.get(doc_name) if term_weights else None
+            if doc_name in self.doc_ids:
+                self.update_doc(doc_name, tokens, doc_vector)
+                continue
+            doc_id = self._next_doc_id
+            self._next_doc_id += 1
+            self.doc_ids[doc_name] = doc_id
+            self.doc_names[doc_id] = doc_name
+            self.docs[doc_name] = tokens
+            self._index_doc(doc_id, tokens, doc_vector)
+
+    def update_doc(self, doc_name: str, tokens: List[str], term_weights: Dict[str, float] = None) -> None:
+        """Replace the tokens of a document, keeping its position in the index."""
+        if doc_name not in self.doc_ids:
+            self.add_docs({doc_name: tokens}, {doc_name: term_weights} if term_weights else None)
+            return
+        doc_id = self.doc_ids[doc_name]
+        self._unindex_doc(doc_id)
+        self.docs[doc_name] = tokens
+        self._index_doc(doc_id, tokens, term_weights)
+
+    def remove_doc(self, doc_name: str) -> None:
+        """Remove a document from the index."""
+        doc_id = self.doc_ids.pop(doc_name)
+        self._unindex_doc(doc_id)
+        del self.doc_vectors[doc_id]
+        self.doc_lengths.pop(doc_id, None)
+        del self.doc_names[doc_id]
+        del self.docs[doc_name]
 
     def _calculate_tf(self, term_freq: int) -> float:
         return 1 + math.log10(term_freq) if term_freq > 0 else 0
@@ -32,86 +129,178 @@ class VectorSpace:
     def _calculate_document_length(self, doc_vector: Dict[str, float]) -> float:
         return math.sqrt(sum(weight * weight for weight in doc_vector.values()))
 
-    def _build_index(self) -> None:
-        # Build inverted index and document vectors
-        for doc_id, (doc_name, tokens) in enumerate(self.docs.items()):
-            # Calculate term frequencies
-            term_freqs = {}
-            for term in tokens:
-                term_freqs[term] = term_freqs.get(term, 0) + 1
+    def calculate_term_weights(self, tokens: List[str]) -> Dict[str, float]:
+        """Return the TF weight of every term of a document, in order of first occurrence."""
+        # Calculate term frequencies
+        term_freqs = {}
+        for term in tokens:
+            term_freqs[term] = term_freqs.get(term, 0) + 1
+        return {term: self._calculate_tf(freq) for term, freq in term_freqs.items()}
 
-            # Calculate TF weights and build inverted index
-            doc_vector = {}
-            for term, freq in term_freqs.items():
-                tf_weight = self._calculate_tf(freq)
-                doc_vector[term] = tf_weight
+    def _index_doc(self, doc_id: int, tokens: List[str], term_weights: Dict[str, float] = None) -> None:
+        # Calculate TF weights and build inverted index
+        if term_weights is None:
+            term_weights = self.calculate_term_weights(tokens)
+        doc_vector = dict(term_weights)
+        for term, tf_weight in doc_vector.items():
+            if term not in self.inverted_index:
+                self.inverted_index[term] = {}
+            self.inverted_index[term][doc_id] = tf_weight
 
-                if term not in self.inverted_index:
-                    self.inverted_index[term] = {}
-                self.inverted_index[term][doc_id] = tf_weight
+        # Store document vector, weights are applied lazily by _refresh_weights
+        self.doc_vectors[doc_id] = doc_vector
+        self._stale = True
 
-            # Store document vector
-            self.doc_vectors[doc_id] = doc_vector
+    def _unindex_doc(self, doc_id: int) -> None:
+        # Drop the document's postings, and any terms left without postings
+        for term in self.doc_vectors[doc_id]:
+            postings = self.inverted_index[term]
+            del postings[doc_id]
+            if not postings:
+                del self.inverted_index[term]
+        self._stale = True
+
+    def _refresh_weights(self) -> None:
+        """
+        Recompute IDF values and normalized document vectors after the corpus changed.
+        Raw TF weights are kept in the inverted index, so no document is re-tokenized.
+        """
+        if not self._stale:
+            return
+        with METRICS.span("index.refresh_weights"):
+            self._recompute_weights()
+
+    def _recompute_weights(self) -> None:
+        self.total_docs = len(self.docs)
+        self.idf_values = {}
+        self._calculate_idfs()
 
         # Apply IDF weights and normalize document vectors
         for doc_id, doc_vector in self.doc_vectors.items():
-            # Apply IDF weights
+            # Apply IDF weights to the raw TF weights
             for term in doc_vector:
-                doc_freq = len(self.inverted_index[term])
-                idf = self._calculate_idf(doc_freq)
-                doc_vector[term] *= idf
+                doc_vector[term] = self.inverted_index[term][doc_id] * self.idf_values[term]
 
             # Normalize document vector
             length = self._calculate_document_length(doc_vector)
+            self.doc_lengths[doc_id] = length
             if length > 0:
                 for term in doc_vector:
                     doc_vector[term] /= length
+        self._stale = False
 
     def _calculate_cosine_similarity(self, query_vector: Dict[str, float], doc_vector: Dict[str, float]) -> float:
         common_terms = set(query_vector.keys()) & set(doc_vector.keys())
         dot_product = sum(query_vector[term] * doc_vector[term] for term in common_terms)
         return dot_product
 
-    def rank_documents(self, query_tokens: List[str]) -> List[tuple]:
-        # Create query vector with TF-IDF weights
-        query_freqs = {}
-        for term in query_tokens:
-            query_freqs[term] = query_freqs.get(term, 0) + 1
-
-        query_vector = {}
-        for term, freq in query_freqs.items():
-            if term in self.inverted_index:
-                tf = self._calculate_tf(freq)
-                idf = self.idf_values.get(term, 0)  # Use cached IDF values
-                query_vector[term] = tf * idf
-
-        if not query_vector:
-            # If no query vector, assign zero similarity to all documents
-            return [(doc_name, 0.0) for doc_name in self.docs.keys()]
-
-        # Normalize query vector
-        query_length = self._calculate_document_length(query_vector)
-        if query_length > 0:
-            for term in query_vector:
-                query_vector[term] /= query_length
-
-        # Calculate cosine similarity for all documents
+    def _build_query_vector(self, query_tokens: List[str]) -> Dict[str, float]:
+        # Create the normalized query vector with TF-IDF weights, using the cached IDF values
+        return weight_query(query_tokens,
+                            lambda term: self.idf_values.get(term, 0) if term in self.inverted_index else None)
+
+    def rank_documents(self, query_tokens: List[str], top_k: int = None,
+                       include_zero_scores: bool = False) -> List[tuple]:
+        """
+        Rank documents by cosine similarity, walking only the posting lists of the query terms.
+        :param query_tokens: Preprocessed query tokens
+        :param top_k: Number of results to return, or None for all matching documents
+        :param include_zero_scores: Also return documents that share no term with the query
+        :return: List of (document name, score) tuples, best first
+        """
+        self._refresh_weights()
+        return self.rank_query_vector(self._build_query_vector(query_tokens), top_k, include_zero_scores)
+
+    def rank_query_vector(self, query_vector: Dict[str, float], top_k: int = None,
+                          include_zero_scores: bool = False) -> List[tuple]:
+        """
+        Rank documents against an already weighted and normalized query vector, e.g. one built
+        with collection-wide IDF values for a shard of the corpus. Terms not in the index are ignored.
+        """
+        self._refresh_weights()
+        with METRICS.span("index.rank"):
+            return self._rank_query_vector(query_vector, top_k, include_zero_scores)
+
+    def _rank_query_vector(self, query_vector: Dict[str, float], top_k: int = None,
+                           include_zero_scores: bool = False) -> List[tuple]:
+        # Accumulate scores term-at-a-time over the query terms' postings
         scores = {}
-        for doc_id, doc_vector in self.doc_vectors.items():
-            similarity = self._calculate_cosine_similarity(query_vector, doc_vector)
-            scores[doc_id] = similarity
+        for term, query_weight in query_vector.items():
+            for doc_id in self.inverted_index.get(term, ()):
+                scores[doc_id] = scores.get(doc_id, 0.0) + query_weight * self.doc_vectors[doc_id][term]
+
+        if include_zero_scores:
+            for doc_id in self.doc_names:
+                if doc_id not in scores:
+                    scores[doc_id] = 0.0
+        else:
+            scores = {doc_id: score for doc_id, score in scores.items() if score > 0}
+
+        # Rank by score, breaking ties by insertion order of the documents
+        ranked_docs = _rank_scores(scores, top_k)
+        return [(self.doc_names[doc_id], score) for doc_id, score in ranked_docs]
+
+    def save(self, path: str) -> None:
+        """
+        Write the index to a compact binary file that can be opened with `VectorSpace.load`.
+        Documents are renumbered densely in insertion order, terms are sorted by their
+        UTF-8 bytes and every posting list is sorted by document id.
+        :param path: File to write the index to
+        """
+        self._refresh_weights()
+        dense_ids = {doc_id: index for index, doc_id in enumerate(self.doc_names)}
 
-        # Include zero scores for documents
-        for doc_id in range(self.total_docs):
-            if doc_id not in scores:
-                scores[doc_id] = 0.0
+        doc_norms = array("d", (self.doc_lengths[doc_id] for doc_id in self.doc_names))
+        doc_name_offsets = array("Q", [0])
+        doc_name_blob = bytearray()
+        for doc_name in self.doc_names.values():
+            doc_name_blob += str(doc_name).encode("utf-8")
+            doc_name_offsets.append(len(doc_name_blob))
 
-        # Rank documents by similarity
-        ranked_docs = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-        return [(list(self.docs.keys())[doc_id], score) for doc_id, score in ranked_docs]
+        terms = sorted(self.inverted_index, key=lambda term: term.encode("utf-8"))
+        term_offsets = array("Q", [0])
+        term_blob = bytearray()
+        term_idfs = array("d")
+        posting_offsets = array("Q", [0])
+        posting_ids = array("I")
+        posting_weights = array("d")
+        for term in terms:
+            term_blob += term.encode("utf-8")
+            term_offsets.append(len(term_blob))
+            term_idfs.append(self.idf_values[term])
+            for doc_id, tf_weight in sorted((dense_ids[doc_id], weight)
+                                            for doc_id, weight in self.inverted_index[term].items()):
+                posting_ids.append(doc_id)
+                posting_weights.append(tf_weight)
+            posting_offsets.append(len(posting_ids))
 
-    def search(self, query_tokens: List[str]) -> List[tuple]:
-        results = self.rank_documents(query_tokens)
+        sections = [doc_norms, doc_name_offsets, doc_name_blob, term_offsets, term_blob,
+                    term_idfs, posting_offsets, posting_ids]
+        section_offsets = []
+        body = bytearray()
+        for section in sections + [posting_weights]:
+            section_offsets.append(INDEX_HEADER.size + len(body))
+            body += _pad(bytes(section))
+
+        header = INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, INDEX_BYTE_ORDER_MARK, len(self.doc_names),
+                                   len(terms), len(posting_ids), *section_offsets[1:])
+        with open(path, "wb") as file:
+            file.write(header)
+            file.write(body)
+
+    @staticmethod
+    def load(path: str) -> "MappedVectorSpace":
+        """Open an index written by `save` as a read-only, memory-mapped index."""
+        return MappedVectorSpace(path)
+
+    def search(self, query_tokens: List[str], verbose: bool = True) -> List[tuple]:
+        """
+        Rank every document, including those scoring zero.
+        :param verbose: Print one line per document, which dominates the query time on large indexes
+        """
+        results = self.rank_documents(query_tokens, include_zero_scores=True)
+        if not verbose:
+            return results
         print("\nTop relevant documents (including zero scores):")
         if not results:
             print("No documents found.")
@@ -121,3 +310,122 @@ class VectorSpace:
         for doc_name, score in results:
             print(f"Document: {doc_name}, Cosine Similarity Score: {score:.4f}")
         return results
+
+
+class MappedVectorSpace:
+    """
+    Read-only index backed by a memory-mapped file written by `VectorSpace.save`.
+    Nothing is decoded up front: terms are found by binary search over the sorted
+    term table and posting lists are read straight from the mapped pages, which
+    several processes opening the same file share.
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+
+        if len(self._buffer) < INDEX_HEADER.size or self._buffer[:4] != INDEX_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a VectorSpace index file")
+        magic, version, byte_order_mark, num_docs, num_terms, num_postings, *offsets = \
+            INDEX_HEADER.unpack_from(self._buffer)
+        if byte_order_mark != INDEX_BYTE_ORDER_MARK:
+            self.close()
+            raise ValueError(f"{path} was written on a machine with a different byte order")
+        if version != INDEX_VERSION:
+            self.close()
+            raise ValueError(f"{path} has index format version {version}, expected {INDEX_VERSION}")
+
+        self.total_docs = num_docs
+        self.total_terms = num_terms
+        self.total_postings = num_postings
+        offsets = [INDEX_HEADER.size] + offsets
+        self.doc_norms = self._section(offsets[0], num_docs, "d")
+        self._doc_name_offsets = self._section(offsets[1], num_docs + 1, "Q")
+        self._doc_name_blob = self._buffer[offsets[2]:offsets[2] + self._doc_name_offsets[num_docs]]
+        self._term_offsets = self._section(offsets[3], num_terms + 1, "Q")
+        self._term_blob = self._buffer[offsets[4]:offsets[4] + self._term_offsets[num_terms]]
+        self.term_idfs = self._section(offsets[5], num_terms, "d")
+        self._posting_offsets = self._section(offsets[6], num_terms + 1, "Q")
+        self.posting_ids = self._section(offsets[7], num_postings, "I")
+        self.posting_weights = self._section(offsets[8], num_postings, "d")
+
+    def _section(self, offset: int, count: int, typecode: str) -> memoryview:
+        size = struct.calcsize(typecode)
+        return self._buffer[offset:offset + count * size].cast(typecode)
+
+    def _term(self, index: int) -> bytes:
+        return bytes(self._term_blob[self._term_offsets[index]:self._term_offsets[index + 1]])
+
+    def find_term(self, term: str) -> int:
+        """Return the index of a term in the term table, or -1 if it is not indexed."""
+        key = term.encode("utf-8")
+        low, high = 0, self.total_terms
+        while low < high:
+            middle = (low + high) // 2
+            if self._term(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.total_terms and self._term(low) == key:
+            return low
+        return -1
+
+    def doc_name(self, doc_id: int) -> str:
+        start, end = self._doc_name_offsets[doc_id], self._doc_name_offsets[doc_id + 1]
+        return bytes(self._doc_name_blob[start:end]).decode("utf-8")
+
+    def rank_documents(self, query_tokens: List[str], top_k: int = None,
+                       include_zero_scores: bool = False) -> List[tuple]:
+        """Rank documents exactly like `VectorSpace.rank_documents` on the saved index."""
+        with METRICS.span("index.rank"):
+            return self._rank_documents(query_tokens, top_k, include_zero_scores)
+
+    def _rank_documents(self, query_tokens: List[str], top_k: int = None,
+                        include_zero_scores: bool = False) -> List[tuple]:
+        term_indices = {}
+
+        def idf_lookup(term: str) -> float:
+            index = self.find_term(term)
+            if index < 0:
+                return None
+            term_indices[term] = index
+            return self.term_idfs[index]
+
+        query_terms = {term_indices[term]: weight for term, weight in weight_query(query_tokens, idf_lookup).items()}
+
+        scores = {}
+        for index, query_weight in query_terms.items():
+            idf = self.term_idfs[index]
+            start, end = self._posting_offsets[index], self._posting_offsets[index + 1]
+            for doc_id, tf_weight in zip(self.posting_ids[start:end], self.posting_weights[start:end]):
+                weight = tf_weight * idf
+                norm = self.doc_norms[doc_id]
+                if norm > 0:
+                    weight /= norm
+                scores[doc_id] = scores.get(doc_id, 0.0) + query_weight * weight
+
+        if include_zero_scores:
+            for doc_id in range(self.total_docs):
+                if doc_id not in scores:
+                    scores[doc_id] = 0.0
+        else:
+            scores = {doc_id: score for doc_id, score in scores.items() if score > 0}
+
+        return [(self.doc_name(doc_id), score) for doc_id, score in _rank_scores(scores, top_k)]
+
+    def close(self) -> None:
+        """Release the views into the mapped file and unmap it."""
+        for name in ("doc_norms", "_doc_name_offsets", "_doc_name_blob", "_term_offsets", "_term_blob",
+                     "term_idfs", "_posting_offsets", "posting_ids", "posting_weights", "_buffer"):
+            view = self.__dict__.pop(name, None)
+            if view is not None:
+                view.release()
+        self._mmap.close()
+
+    def __enter__(self) -> "MappedVectorSpace":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()